@@ -0,0 +1,144 @@
+"""Logging overhead of the /api/download route.
+
+Runs the small article fixture through the route under the former
+per-request ``basicConfig(level=DEBUG)`` setup and under the logging
+configured once at startup. For each it reports the time spent creating
+and emitting log records, plus the records and bytes written per request.
+Log output goes to an in-memory sink, so terminal speed does not matter.
+Also compares eager f-string and lazy %-style formatting of a suppressed
+DEBUG call.
+
+    python benchmarks/bench_logging.py [--runs 50]
+"""
+import io
+import os
+import sys
+import time
+import timeit
+import logging
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.update({
+    'QIITA_INGEST_MODE': 'html',
+    'QIITA_IMAGE_CACHE_MAX_BYTES': '0',
+    'QIITA_ARTICLE_CACHE_MAX_BYTES': '0',
+    'NO_PROXY': '127.0.0.1,localhost',
+})
+
+from flask import Flask  # noqa: E402
+from fixtures import build_scenarios  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+from src.routes.download import download_bp  # noqa: E402
+from src.utils import log_config  # noqa: E402
+
+
+class _LogTimer:
+    """Accumulate time spent in ``Logger._log`` (record creation and handlers)."""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self._original = logging.Logger._log
+
+    def __enter__(self):
+        original = self._original
+
+        def timed_log(logger, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(logger, *args, **kwargs)
+            finally:
+                self.seconds += time.perf_counter() - start
+
+        logging.Logger._log = timed_log
+        return self
+
+    def __exit__(self, *exc):
+        logging.Logger._log = self._original
+
+
+class _CountingStream(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.records = 0
+
+    def write(self, text):
+        self.records += text.count('\n')
+        return super().write(text)
+
+
+def _reset_logging():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    log_config._configured = False
+
+
+def legacy_setup(stream):
+    """What the route used to do on every request."""
+    logging.basicConfig(level=logging.DEBUG, stream=stream)
+
+
+def configured_setup(fmt):
+    def setup(stream):
+        log_config.configure_logging(level='INFO', fmt=fmt, stream=stream)
+    return setup
+
+
+def measure(client, url, setup, runs):
+    _reset_logging()
+    stream = _CountingStream()
+    setup(stream)
+    client.post('/api/download', json={'url': url}).get_data()  # ウォームアップ
+    stream.records = 0
+    start_size = stream.tell()
+    timings = []
+    with _LogTimer() as log_timer:
+        for _ in range(runs):
+            start = time.perf_counter()
+            client.post('/api/download', json={'url': url}).get_data()
+            timings.append(time.perf_counter() - start)
+    size = stream.tell() - start_size
+    _reset_logging()
+    return statistics.median(timings), log_timer.seconds / runs, stream.records / runs, size / runs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    routes, articles = build_scenarios(['small'])
+    server = StubServer(routes).start()
+    app = Flask(__name__)
+    app.register_blueprint(download_bp, url_prefix='/api')
+    log_config.init_app(app)
+    client = app.test_client()
+    url = server.base_url + articles['small']
+
+    try:
+        print(f"runs: {args.runs}")
+        print(f"{'setup':<26}{'median ms':>10}{'logging us':>12}{'records':>9}{'log bytes':>11}")
+        for name, setup in (('basicConfig(DEBUG)', legacy_setup),
+                            ('configured INFO text', configured_setup('text')),
+                            ('configured INFO json', configured_setup('json'))):
+            seconds, log_seconds, records, size = measure(client, url, setup, args.runs)
+            print(f"{name:<26}{seconds * 1000:>10.2f}{log_seconds * 1e6:>12.0f}{records:>9.1f}{size:>11.0f}")
+    finally:
+        server.stop()
+
+    logger = logging.getLogger('bench')
+    logger.setLevel(logging.INFO)
+    data = {'url': url, 'stream': True, 'optimize_images': {'max_dimension': 1600}}
+    number = 200000
+    eager = timeit.timeit(lambda: logger.debug(f"Request data received: {data}"), number=number)
+    lazy = timeit.timeit(lambda: logger.debug("Request data received: %s", data), number=number)
+    print(f"suppressed debug call: f-string {eager / number * 1e6:.2f} us, lazy {lazy / number * 1e6:.2f} us")
+
+
+if __name__ == '__main__':
+    main()
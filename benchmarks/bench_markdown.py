@@ -0,0 +1,72 @@
+"""Throughput of the Markdown post-processing stage.
+
+Compares the former chain of seven whole-document ``re.sub`` passes with
+``normalize_markdown`` on a large markdownify-style document, and reports
+whether each leaves fenced code blocks intact.
+
+    python benchmarks/bench_markdown.py [--runs 10] [--sections 2000]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.markdown_normalizer import normalize_markdown  # noqa: E402
+
+CODE_BLOCK = '```\npattern = r"\\*\\*(.+?)\\*\\*"\nprint(**kwargs)\n```'
+
+
+def legacy_normalize(markdown_content):
+    """The regex chain previously applied after markdownify."""
+    markdown_content = re.sub(r'^(#{1,6})([^\s#])', r'\1 \2', markdown_content, flags=re.MULTILINE)
+    markdown_content = re.sub(r'^(#{1,6})\s+', r'\1 ', markdown_content, flags=re.MULTILINE)
+    markdown_content = re.sub(r'\\(\*\*)', r'\1', markdown_content)
+    markdown_content = re.sub(r'(?<!\\)\\(\*)(?!\*)', r'\1', markdown_content)
+    markdown_content = re.sub(r'\\(\*)', r'\1', markdown_content)
+    markdown_content = re.sub(r'(\*\*[^*]+\*\*)([^\s])', r'\1 \2', markdown_content)
+    markdown_content = re.sub(r'(?<!\*)(\*[^*]+\*)(?!\*)([^\s])', r'\1 \2', markdown_content)
+    return markdown_content
+
+
+def build_document(sections):
+    parts = []
+    for i in range(sections):
+        parts.append(
+            f"##Section {i}\n\n"
+            f"本文 **強調(内容)**続き、*italic*text と `inline **code**` を含む段落です。\n\n"
+            f"* item {i}\n* item **{i}**\n\n{CODE_BLOCK}\n"
+        )
+    return '\n'.join(parts)
+
+
+def measure(func, text, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--sections', type=int, default=2000)
+    args = parser.parse_args()
+
+    text = build_document(args.sections)
+    size_mib = len(text.encode('utf-8')) / (1024 * 1024)
+    print(f"document: {size_mib:.2f} MiB, runs: {args.runs}")
+    print(f"{'implementation':<20}{'median ms':>10}{'MiB/s':>8}  code blocks intact")
+    for name, func in (('regex chain', legacy_normalize), ('normalize_markdown', normalize_markdown)):
+        seconds, result = measure(func, text, args.runs)
+        intact = result.count(CODE_BLOCK) == args.sections
+        print(f"{name:<20}{seconds * 1000:>10.1f}{size_mib / seconds:>8.1f}  {intact}")
+
+
+if __name__ == '__main__':
+    main()
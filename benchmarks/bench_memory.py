@@ -0,0 +1,135 @@
+"""Peak RSS per request with and without download size limits.
+
+Serves oversized responses from the local stub server: a 64 MiB article page,
+an article with one 64 MiB image, and an article whose images add up to more
+than the per-request byte budget. Each case runs one buffered ``/api/download``
+in a fresh interpreter, with the limits on (default page and image limits, a
+``--budget-mib`` budget) and off, and with and without ``Content-Length``
+(chunked), so the streamed byte count is exercised as well.
+
+    python benchmarks/bench_memory.py [--size-mib 64] [--budget-mib 16]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import BENCH_ENV  # noqa: E402
+from fixtures import ARTICLE_PATH, build_article, png  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIB = 1024 * 1024
+
+
+def build_cases(size):
+    """Return ``({path: (body, content_type)}, {case: article path})``."""
+    routes = {}
+    routes.update(build_article('baseline', sections=5, images=1, image_side=160))
+
+    page = build_article('oversized-page', sections=5)
+    path = ARTICLE_PATH.format(name='oversized-page')
+    body, content_type = page[path]
+    routes[path] = (body.replace(b'</body>', b'<!--' + b'x' * size + b'--></body>'), content_type)
+
+    routes.update(build_article('oversized-image', sections=5, images=1, image_side=160))
+    routes['/images/oversized-image/0.png'] = (png(160, 160, 'oversized') + b'\x00' * size, 'image/png')
+
+    # 1枚は上限以下だが合計が1リクエストの予算を超える
+    image = png(1024, 1024, 'budget')
+    many = build_article('over-budget', sections=40, images=40, image_side=16)
+    for index in range(40):
+        many[f'/images/over-budget/{index}.png'] = (image, 'image/png')
+    routes.update(many)
+
+    cases = ['oversized-page', 'oversized-image', 'over-budget']
+    return routes, {case: ARTICLE_PATH.format(name=case) for case in ['baseline'] + cases}
+
+
+def _rss_kib(field):
+    # ru_maxrss は fork 元の値を引き継ぐため /proc から読む（Linuxのみ）
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    raise RuntimeError(f'{field} not found in /proc/self/status')
+
+
+def run_child(base_url, article_path, case_path):
+    """Download the baseline article, then the case, and print status and RSS as JSON."""
+    sys.path.insert(0, ROOT)
+    from flask import Flask
+    from src.routes.download import download_bp
+
+    app = Flask(__name__)
+    app.register_blueprint(download_bp, url_prefix='/api')
+    client = app.test_client()
+
+    client.post('/api/download', json={'url': base_url + article_path, 'stream': False}).get_data()
+    baseline = _rss_kib('VmRSS')
+    # ピークRSSを現在値に戻し、このリクエストだけのピークを測る
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    response = client.post('/api/download', json={'url': base_url + case_path, 'stream': False})
+    body = response.get_data()
+    print(json.dumps({
+        'status': response.status_code,
+        'bytes_out': len(body),
+        'baseline_kib': baseline,
+        'peak_rss_kib': _rss_kib('VmHWM'),
+    }))
+
+
+def run_case(base_url, articles, case, limits, budget):
+    env = dict(os.environ, **BENCH_ENV, QIITA_LOG_LEVEL='CRITICAL')
+    if limits:
+        env['QIITA_MAX_JOB_BYTES'] = str(budget)
+    else:
+        env.update(QIITA_MAX_PAGE_BYTES='0', QIITA_MAX_IMAGE_BYTES='0', QIITA_MAX_JOB_BYTES='0')
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', base_url, articles['baseline'], articles[case]],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'child failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        run_child(*sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size-mib', type=int, default=64, help='size of the oversized page and image')
+    parser.add_argument('--budget-mib', type=int, default=16, help='per-request byte budget')
+    args = parser.parse_args()
+
+    routes, articles = build_cases(args.size_mib * MIB)
+    print(f"oversized: {args.size_mib} MiB, budget: {args.budget_mib} MiB")
+    print(f"{'case':<17}{'transfer':<11}{'limits':<8}{'status':>7}{'ZIP KiB':>10}{'base MiB':>10}{'peak MiB':>10}")
+    for chunked in (False, True):
+        server = StubServer(routes, chunked=chunked).start()
+        transfer = 'chunked' if chunked else 'length'
+        try:
+            for case in ('oversized-page', 'oversized-image', 'over-budget'):
+                for limits in (True, False):
+                    label = 'on' if limits else 'off'
+                    try:
+                        data = run_case(server.base_url, articles, case, limits, args.budget_mib * MIB)
+                    except RuntimeError as e:
+                        print(f"{case:<17}{transfer:<11}{label:<8}failed: {e}")
+                        continue
+                    print(
+                        f"{case:<17}{transfer:<11}{label:<8}{data['status']:>7}{data['bytes_out'] / 1024:>10.1f}"
+                        f"{data['baseline_kib'] / 1024:>10.1f}{data['peak_rss_kib'] / 1024:>10.1f}"
+                    )
+        finally:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Parse time and memory of parse_article per HTML backend.
+
+Compares the original full-document ``html.parser`` tree with scoped parsing
+and the lxml backend on a synthetic Qiita-sized page.
+
+    python benchmarks/bench_parse.py [--runs 20]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.routes import download  # noqa: E402
+
+
+class _Page:
+    """Minimal stand-in for a requests.Response holding HTML."""
+
+    def __init__(self, content):
+        self.content = content
+        self.headers = {'Content-Type': 'text/html; charset=utf-8'}
+
+
+def build_page(sections=40, sidebar_items=400):
+    """Return a page shaped like a Qiita article: heavy chrome, one content section."""
+    chrome = ''.join(
+        f'<li class="nav-item"><a href="/tags/t{i}"><span class="icon"></span>tag {i}</a></li>'
+        for i in range(sidebar_items)
+    )
+    scripts = ''.join(
+        f'<script>window.__data{i} = {{"items": [{", ".join(str(n) for n in range(200))}]}};</script>'
+        for i in range(20)
+    )
+    body = ''.join(
+        f'<h2 id="s{i}">Section {i}</h2><p>Paragraph <strong>bold {i}</strong> and <em>em</em>.</p>'
+        f'<div class="code-frame"><pre><code>for i in range({i}):\n    print(i * 2)\n</code></pre></div>'
+        f'<p><a href="https://qiita-image-store.s3.amazonaws.com/{i}.png">'
+        f'<img src="https://qiita-image-store.s3.amazonaws.com/{i}.png" alt="img {i}"></a></p>'
+        for i in range(sections)
+    )
+    html = (
+        '<!DOCTYPE html><html><head><title>Article</title>'
+        f'{scripts}</head><body><header><nav><ul>{chrome}</ul></nav></header>'
+        '<main><article><h1 data-logly-title="true">Benchmark Article</h1>'
+        f'<section class="it-MdContent">{body}</section></article>'
+        f'<aside><ul>{chrome}</ul></aside></main><footer>{chrome}</footer></body></html>'
+    )
+    return html.encode('utf-8')
+
+
+def measure(page, parser, scoped, runs):
+    """Return (median seconds, peak bytes) for parse_article on ``page``."""
+    original = download.HTML_PARSER, download.SCOPED_PARSE
+    download.HTML_PARSER, download.SCOPED_PARSE = parser, scoped
+    try:
+        timings = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            download.parse_article(page)
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        download.parse_article(page)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        download.HTML_PARSER, download.SCOPED_PARSE = original
+    return statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    page = _Page(build_page())
+    print(f"page size: {len(page.content) / 1024:.0f} KiB, runs: {args.runs}")
+    print(f"{'backend':<14}{'scoped':<8}{'median ms':>10}{'peak KiB':>10}")
+
+    backends = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        backends.append('lxml')
+    except ImportError:
+        print("(lxml not installed; skipping)")
+
+    for backend in backends:
+        for scoped in (False, True):
+            seconds, peak = measure(page, backend, scoped, args.runs)
+            print(f"{backend:<14}{str(scoped):<8}{seconds * 1000:>10.1f}{peak / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
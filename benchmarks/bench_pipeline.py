@@ -0,0 +1,173 @@
+"""Throughput, latency, memory and bytes per stage of the download pipeline.
+
+Replays article fixtures (small, code-heavy, image-heavy, huge) from a local
+stub server, so no network access is needed, through ``download_qiita_article``
+and the ``/api/download`` route (streamed and buffered). Each scenario and
+mode runs in a fresh interpreter so peak RSS is measured per run. Caches are
+disabled so every run does the full work.
+
+    python benchmarks/bench_pipeline.py [--runs 10] [--scenarios small,huge]
+        [--modes function,route,route-buffered] [--latency 0.02] [--recorded DIR]
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fixtures import SCENARIOS, build_scenarios, load_recorded  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('function', 'route', 'route-buffered')
+
+BENCH_ENV = {
+    'QIITA_INGEST_MODE': 'html',
+    'QIITA_IMAGE_CACHE_MAX_BYTES': '0',
+    'QIITA_ARTICLE_CACHE_MAX_BYTES': '0',
+    'QIITA_HTTP_RETRIES': '0',
+    'QIITA_RATE_LIMIT': '0',
+    'QIITA_ARCHIVE': '0',
+    'NO_PROXY': '127.0.0.1,localhost',
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _directory_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files
+    )
+
+
+def run_child(url, mode, runs):
+    """Run one scenario in this process and print the measurements as JSON."""
+    sys.path.insert(0, ROOT)
+    from flask import Flask
+    from src.routes.download import download_bp, download_qiita_article
+    from src.utils import metrics
+
+    if mode == 'function':
+        work_dir = tempfile.mkdtemp()
+
+        def once():
+            output_dir = tempfile.mkdtemp(dir=work_dir)
+            try:
+                download_qiita_article(url, output_dir)
+                return _directory_size(output_dir)
+            finally:
+                shutil.rmtree(output_dir)
+    else:
+        app = Flask(__name__)
+        app.register_blueprint(download_bp, url_prefix='/api')
+        client = app.test_client()
+
+        def once():
+            response = client.post('/api/download', json={'url': url, 'stream': mode == 'route'})
+            body = response.get_data()
+            if response.status_code != 200:
+                raise RuntimeError(f"{response.status_code}: {body[:200]!r}")
+            return len(body)
+
+    once()  # ウォームアップ（インポートや接続の確立を計測から除く）
+    stages_before = metrics.STAGE_SECONDS.snapshot()
+    bytes_before = metrics.BYTES_FETCHED.snapshot()
+
+    latencies = []
+    bytes_out = 0
+    started = time.perf_counter()
+    for _ in range(runs):
+        start = time.perf_counter()
+        bytes_out += once()
+        latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+
+    stages = {
+        key[0]: (total - stages_before.get(key, (0, 0.0))[1]) / runs
+        for key, (_, total) in metrics.STAGE_SECONDS.snapshot().items()
+    }
+    bytes_in = {
+        key[0]: (value - bytes_before.get(key, 0)) / runs
+        for key, value in metrics.BYTES_FETCHED.snapshot().items()
+    }
+    print(json.dumps({
+        'latencies': latencies,
+        'elapsed': elapsed,
+        'bytes_out': bytes_out / runs,
+        'bytes_in': bytes_in,
+        'stages': stages,
+        'peak_rss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }))
+
+
+def run_scenario(base_url, path, mode, runs):
+    env = dict(os.environ, **BENCH_ENV)
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', mode, base_url + path, str(runs)],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'child failed')
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def report(name, mode, data):
+    latencies = data['latencies']
+    runs = len(latencies)
+    mib = 1024 * 1024
+    print(
+        f"{name:<13}{mode:<16}{percentile(latencies, 0.5) * 1000:>9.1f}{percentile(latencies, 0.95) * 1000:>9.1f}"
+        f"{runs / data['elapsed']:>10.2f}{data['bytes_out'] * runs / data['elapsed'] / mib:>9.1f}"
+        f"{data['peak_rss_kib'] / 1024:>9.1f}"
+    )
+    stages = ', '.join(f"{stage} {seconds * 1000:.1f}" for stage, seconds in sorted(data['stages'].items()))
+    bytes_in = ', '.join(f"{kind} {size / 1024:.0f}" for kind, size in sorted(data['bytes_in'].items()))
+    print(f"{'':<13}  stages ms/article: {stages}")
+    print(f"{'':<13}  KiB/article: in {bytes_in}; out {data['bytes_out'] / 1024:.0f}")
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        run_child(sys.argv[3], sys.argv[2], int(sys.argv[4]))
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every stub response')
+    parser.add_argument('--recorded', help='directory of recorded pages to replay instead of the fixtures')
+    args = parser.parse_args()
+
+    if args.recorded:
+        routes, articles = load_recorded(args.recorded)
+    else:
+        routes, articles = build_scenarios(args.scenarios.split(','))
+    server = StubServer(routes, latency=args.latency).start()
+    try:
+        print(f"runs: {args.runs}, stub latency: {args.latency * 1000:.0f} ms")
+        print(f"{'scenario':<13}{'mode':<16}{'p50 ms':>9}{'p95 ms':>9}{'art/s':>10}{'MiB/s':>9}{'RSS MiB':>9}")
+        for name, path in articles.items():
+            for mode in args.modes.split(','):
+                try:
+                    data = run_scenario(server.base_url, path, mode, args.runs)
+                except RuntimeError as e:
+                    print(f"{name:<13}{mode:<16}failed: {e}")
+                    continue
+                report(name, mode, data)
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Load test of the production server: requests/sec by number of workers.
+
+Starts gunicorn (gunicorn.conf.py) with 1, 2, 4 ... workers up to the CPU
+count and drives ``/api/download`` with concurrent clients for a fixed time.
+Articles come from the local stub server, so no network access is needed,
+and caches are disabled so every request does the full work. On shutdown
+the server gets SIGTERM and has to exit cleanly within the graceful timeout.
+
+    python benchmarks/bench_server.py [--workers 1,2,4] [--threads 8]
+        [--concurrency 16] [--duration 10] [--scenario code-heavy] [--latency 0.02]
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import threading
+import subprocess
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import BENCH_ENV, percentile  # noqa: E402
+from fixtures import SCENARIOS, build_scenarios  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(workers, threads):
+    port = _free_port()
+    env = dict(os.environ, **BENCH_ENV, QIITA_LOG_LEVEL='WARNING')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'),
+         '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads),
+         'src.wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(process.stderr.read().strip().splitlines()[-1])
+        try:
+            requests.get(f'{base_url}/api/health', timeout=1)
+            return process, base_url
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('server did not start')
+
+
+def stop_server(process):
+    """SIGTERM and wait; returns seconds until the server exited."""
+    start = time.perf_counter()
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=90)
+    return time.perf_counter() - start
+
+
+def drive(base_url, article_url, concurrency, duration):
+    """Send downloads from ``concurrency`` clients for ``duration`` seconds."""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            try:
+                response = session.post(f'{base_url}/api/download', json={'url': article_url}, timeout=120)
+                response.content
+                ok = response.status_code == 200
+            except requests.exceptions.RequestException:
+                ok = False
+            with lock:
+                (latencies if ok else errors).append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, len(errors), time.perf_counter() - started
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = []
+    count = 1
+    while count <= cpus:
+        default_workers.append(count)
+        count *= 2
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)))
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--scenario', default='code-heavy', choices=list(SCENARIOS))
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every stub response')
+    args = parser.parse_args()
+
+    routes, articles = build_scenarios([args.scenario])
+    stub = StubServer(routes, latency=args.latency).start()
+    article_url = stub.base_url + articles[args.scenario]
+    try:
+        print(f"scenario: {args.scenario}, cpus: {cpus}, threads/worker: {args.threads}, "
+              f"clients: {args.concurrency}, {args.duration:.0f}s each")
+        print(f"{'workers':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}{'stop s':>8}")
+        for workers in map(int, args.workers.split(',')):
+            process, base_url = start_server(workers, args.threads)
+            try:
+                drive(base_url, article_url, args.concurrency, 1)  # ウォームアップ
+                latencies, errors, elapsed = drive(base_url, article_url, args.concurrency, args.duration)
+            finally:
+                stop_seconds = stop_server(process)
+            if not latencies:
+                print(f"{workers:>8}{'-':>9}{'-':>9}{'-':>9}{errors:>8}{stop_seconds:>8.1f}")
+                continue
+            print(
+                f"{workers:>8}{len(latencies) / elapsed:>9.1f}{percentile(latencies, 0.5) * 1000:>9.0f}"
+                f"{percentile(latencies, 0.95) * 1000:>9.0f}{errors:>8}{stop_seconds:>8.1f}"
+            )
+    finally:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
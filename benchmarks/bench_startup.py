@@ -0,0 +1,119 @@
+"""Cold start: import time of the app and latency of the first requests.
+
+Each case runs in fresh interpreters with ``-X importtime``. It imports the
+app, then sends the first ``/api/health`` and the first ``/api/download``
+(an article from the local stub server) through the test client. The
+medians over ``--runs`` are reported. Cases:
+
+* ``main``: ``import src.main``, i.e. schema creation and heavy modules deferred
+* ``wsgi``: ``import src.wsgi``, the gunicorn entry point (schema + preload)
+* ``wsgi lazy``: the same with ``QIITA_PRELOAD=0``
+* ``wsgi lazy, no debug``: additionally ``QIITA_DEBUG_ROUTES=0``
+
+``--top N`` lists the top-level packages and ``src`` modules with the
+largest cumulative import time for the ``wsgi`` case.
+
+    python benchmarks/bench_startup.py [--runs 5] [--top 15]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import BENCH_ENV  # noqa: E402
+from fixtures import build_scenarios  # noqa: E402
+from stub_server import StubServer  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CASES = {
+    'main': ('src.main', {}),
+    'wsgi': ('src.wsgi', {}),
+    'wsgi lazy': ('src.wsgi', {'QIITA_PRELOAD': '0'}),
+    'wsgi lazy, no debug': ('src.wsgi', {'QIITA_PRELOAD': '0', 'QIITA_DEBUG_ROUTES': '0'}),
+}
+
+
+# 子プロセスでは計測対象以外のモジュールを先に読み込まないよう、このファイルは import しない
+CHILD = """
+import sys, json, time, importlib
+module, article_url = sys.argv[1:]
+start = time.perf_counter()
+app = importlib.import_module(module).app
+imported = time.perf_counter()
+client = app.test_client()
+client.get('/api/health').get_data()
+health = time.perf_counter()
+client.post('/api/download', json={'url': article_url, 'stream': False}).get_data()
+download = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'first_health': health - imported,
+    'first_download': download - health,
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Return ``{module: cumulative seconds}`` from ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = max(modules.get(name.strip(), 0), int(cumulative) / 1e6)
+    return modules
+
+
+def run_case(module, extra_env, article_url):
+    env = dict(os.environ, **BENCH_ENV, **extra_env, QIITA_LOG_LEVEL='WARNING')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD, module, article_url],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'child failed')
+    return json.loads(result.stdout.strip().splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters per case')
+    parser.add_argument('--top', type=int, default=15, help='modules to list by import time')
+    args = parser.parse_args()
+
+    routes, articles = build_scenarios(['small'])
+    server = StubServer(routes).start()
+    article_url = server.base_url + articles['small']
+    top_modules = None
+    print(f"{'case':<22}{'import ms':>10}{'health ms':>11}{'download ms':>13}{'total ms':>10}")
+    try:
+        for case, (module, extra_env) in CASES.items():
+            runs = []
+            for _ in range(args.runs):
+                timings, modules = run_case(module, extra_env, article_url)
+                runs.append(timings)
+                if case == 'wsgi':
+                    top_modules = modules
+            median = {key: statistics.median(run[key] for run in runs) * 1000 for key in runs[0]}
+            print(
+                f"{case:<22}{median['import']:>10.1f}{median['first_health']:>11.1f}"
+                f"{median['first_download']:>13.1f}{sum(median.values()):>10.1f}"
+            )
+    finally:
+        server.stop()
+
+    if args.top and top_modules:
+        print(f"\nslowest imports (cumulative, {CASES['wsgi'][0]}):")
+        modules = {name: seconds for name, seconds in top_modules.items()
+                   if '.' not in name or name.startswith('src.')}
+        for name, seconds in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"  {seconds * 1000:>8.1f} ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Static file serving: requests/sec and bytes per page view.
+
+Serves ``src/static`` through the catch-all route of ``src.main`` and through
+the previous implementation (``os.path.exists`` + ``send_from_directory`` on
+every request) for a first visit with ``Accept-Encoding: gzip, br``, a repeat
+visit sending the ETag back in ``If-None-Match``, and a client route that
+falls back to ``index.html``. Filesystem calls per request are counted by
+wrapping ``os.stat``.
+
+    python benchmarks/bench_static.py [--requests 2000]
+"""
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import BENCH_ENV  # noqa: E402
+
+os.environ.update(BENCH_ENV, QIITA_LOG_LEVEL='WARNING')
+
+from flask import Flask, send_from_directory  # noqa: E402
+
+PAGE = ('/', '/favicon.ico')
+
+
+def legacy_app(static_folder):
+    """The catch-all route as it was before the static manifest."""
+    app = Flask(__name__, static_folder=static_folder)
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve(path):
+        if path != "" and os.path.exists(os.path.join(static_folder, path)):
+            return send_from_directory(static_folder, path)
+        return send_from_directory(static_folder, 'index.html')
+
+    return app
+
+
+class _StatCounter:
+    def __init__(self):
+        self.calls = 0
+        self._stat = os.stat
+
+    def __enter__(self):
+        def counting_stat(*args, **kwargs):
+            self.calls += 1
+            return self._stat(*args, **kwargs)
+        os.stat = counting_stat
+        return self
+
+    def __exit__(self, *exc):
+        os.stat = self._stat
+
+
+def page_view(client, etags, paths):
+    """Request ``paths`` once; returns the body bytes received."""
+    received = 0
+    for path in paths:
+        headers = {'Accept-Encoding': 'gzip, br'}
+        if path in etags:
+            headers['If-None-Match'] = etags[path]
+        response = client.get(path, headers=headers)
+        received += len(response.get_data())
+        if response.headers.get('ETag'):
+            etags.setdefault(path, response.headers['ETag'])
+    return received
+
+
+def run(client, requests, paths, repeat):
+    etags = {}
+    if repeat:
+        page_view(client, etags, paths)
+    views = max(1, requests // len(paths))
+    received = 0
+    with _StatCounter() as stats:
+        start = time.perf_counter()
+        for _ in range(views):
+            received += page_view(client, etags if repeat else {}, paths)
+        elapsed = time.perf_counter() - start
+    return views * len(paths) / elapsed, received / views, stats.calls / (views * len(paths))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000, help='requests per case')
+    args = parser.parse_args()
+
+    from src.main import app
+    apps = {'manifest': app, 'legacy': legacy_app(app.static_folder)}
+    cases = {
+        'first view': (PAGE, False),
+        'repeat view': (PAGE, True),
+        'client route': (('/items/123',), False),
+    }
+    print(f"{'case':<14}{'server':<10}{'req/s':>10}{'KiB/view':>10}{'stat/req':>10}")
+    for case, (paths, repeat) in cases.items():
+        for name, server in apps.items():
+            rate, received, stats = run(server.test_client(), args.requests, paths, repeat)
+            print(f"{case:<14}{name:<10}{rate:>10.0f}{received / 1024:>10.1f}{stats:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
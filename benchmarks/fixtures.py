@@ -0,0 +1,118 @@
+"""Article and image fixtures for the offline pipeline benchmark.
+
+Synthetic fixtures are generated deterministically in the shape of a Qiita
+article page. Recorded pages can be replayed with ``load_recorded``.
+"""
+import os
+import re
+import zlib
+import random
+import struct
+
+ARTICLE_PATH = '/qiita.com/bench/items/{name}'
+
+
+def png(width, height, seed):
+    """Return a noisy RGB PNG, which compresses about as badly as a photo."""
+    rng = random.Random(seed)
+    row_bytes = width * 3
+    raw = b''.join(b'\x00' + rng.randbytes(row_bytes) for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 1)) + chunk(b'IEND', b'')
+
+
+def _chrome(items):
+    return ''.join(
+        f'<li class="nav-item"><a href="/tags/t{i}"><span class="icon"></span>tag {i}</a></li>'
+        for i in range(items)
+    )
+
+
+def build_article(name, sections, code_lines=0, images=0, image_side=0):
+    """Return ``{path: (body, content_type)}`` for one article and its images."""
+    routes = {}
+    rng = random.Random(name)
+    body = []
+    image_index = 0
+    for section in range(sections):
+        body.append(
+            f'<h2 id="s{section}">Section {section}</h2>'
+            f'<p>本文 <strong>bold {section}</strong> と <em>em</em>、<code>inline()</code> を含む段落。</p>'
+        )
+        if code_lines:
+            code = '\n'.join(f'    value_{n} = compute({n}) * {rng.randint(1, 99)}  # **not emphasis**'
+                             for n in range(code_lines))
+            body.append(f'<div class="code-frame"><pre><code>def f{section}():\n{code}\n</code></pre></div>')
+        if image_index < images and section * images // sections >= image_index:
+            path = f'/images/{name}/{image_index}.png'
+            routes[path] = (png(image_side, image_side, f'{name}-{image_index}'), 'image/png')
+            body.append(f'<p><a href="{path}"><img src="{path}" alt="image {image_index}"></a></p>')
+            image_index += 1
+
+    html = (
+        '<!DOCTYPE html><html><head><title>Article</title></head><body>'
+        f'<header><nav><ul>{_chrome(200)}</ul></nav></header>'
+        f'<main><article><h1 data-logly-title="true">Benchmark {name}</h1>'
+        f'<section class="it-MdContent">{"".join(body)}</section></article></main>'
+        f'<footer>{_chrome(200)}</footer></body></html>'
+    )
+    routes[ARTICLE_PATH.format(name=name)] = (html.encode('utf-8'), 'text/html; charset=utf-8')
+    return routes
+
+
+SCENARIOS = {
+    'small': dict(sections=5, images=1, image_side=160),
+    'code-heavy': dict(sections=200, code_lines=30, images=2, image_side=160),
+    'image-heavy': dict(sections=40, images=40, image_side=256),
+    'huge': dict(sections=2000, code_lines=10, images=100, image_side=192),
+}
+
+
+def build_scenarios(names=None):
+    """Return ``({path: (body, content_type)}, {scenario: article path})``."""
+    routes = {}
+    articles = {}
+    for name, params in SCENARIOS.items():
+        if names and name not in names:
+            continue
+        routes.update(build_article(name, **params))
+        articles[name] = ARTICLE_PATH.format(name=name)
+    return routes, articles
+
+
+_ABSOLUTE_URL = re.compile(r'https?://([^/"\'\s]+)/')
+
+_CONTENT_TYPES = {
+    '.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.gif': 'image/gif',
+    '.webp': 'image/webp', '.svg': 'image/svg+xml',
+}
+
+
+def load_recorded(directory):
+    """Load recorded pages for replay.
+
+    The directory holds ``<name>.html`` pages and the images they reference,
+    saved as ``<host>/<path>``. Absolute URLs in the pages are rewritten to
+    point at the stub server, so nothing is fetched from the network.
+    """
+    routes = {}
+    articles = {}
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            path = os.path.join(root, file_name)
+            relative = os.path.relpath(path, directory).replace(os.sep, '/')
+            with open(path, 'rb') as f:
+                content = f.read()
+            if root == directory and file_name.endswith('.html'):
+                name = file_name[:-len('.html')]
+                html = _ABSOLUTE_URL.sub(r'/\1/', content.decode('utf-8'))
+                routes[ARTICLE_PATH.format(name=name)] = (html.encode('utf-8'), 'text/html; charset=utf-8')
+                articles[name] = ARTICLE_PATH.format(name=name)
+            else:
+                content_type = _CONTENT_TYPES.get(os.path.splitext(file_name)[1].lower(), 'application/octet-stream')
+                routes[f'/{relative}'] = (content, content_type)
+    return routes, articles
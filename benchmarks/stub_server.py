@@ -0,0 +1,73 @@
+"""Local HTTP server that replays benchmark fixtures."""
+import sys
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class _Server(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # クライアントが途中で切断した（サイズ上限で読むのをやめた）場合は無視する
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class StubServer:
+    """Serve ``{path: (body, content_type)}`` on localhost.
+
+    ``latency`` (seconds) is added to every response to mimic a remote host.
+    With ``chunked`` bodies are sent without ``Content-Length``.
+    """
+
+    def __init__(self, routes, latency=0.0, chunked=False):
+        self.routes = routes
+        self.latency = latency
+        self.chunked = chunked
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if server.latency:
+                    time.sleep(server.latency)
+                route = server.routes.get(self.path.split('?')[0])
+                if route is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body, content_type = route
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                if not server.chunked:
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for start in range(0, len(body), 65536):
+                    chunk = body[start:start + 65536]
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+                self.wfile.write(b'0\r\n\r\n')
+
+        self._httpd = _Server(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
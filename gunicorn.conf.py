@@ -0,0 +1,75 @@
+"""gunicorn settings for running the app in production.
+
+    gunicorn src.wsgi:app
+
+Workers are processes using the gthread worker: each handles ``threads``
+requests at once, which suits downloads that mostly wait on the network.
+Every value can be overridden with the QIITA_* environment variables below
+or gunicorn's own command line options.
+"""
+import os
+import tempfile
+import multiprocessing
+
+bind = os.environ.get('QIITA_BIND', '0.0.0.0:5001')
+workers = int(os.environ.get('QIITA_WORKERS', '0')) or multiprocessing.cpu_count()
+worker_class = 'gthread'
+threads = int(os.environ.get('QIITA_THREADS', '8'))
+
+# ワーカープロセスのメトリクスを集計するディレクトリ（各ワーカーが書き出し、/api/metrics が合計する）
+os.environ.setdefault(
+    'QIITA_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'qiita_web_downloader', f"metrics-{os.getpid()}")
+)
+
+# 画像最適化のプロセスプールはワーカーごとに作られるため、合計がCPUコア数になるように分ける
+os.environ.setdefault('QIITA_IMAGE_PROCESSES', str(max(1, multiprocessing.cpu_count() // workers)))
+
+# 記事のダウンロードは数十秒かかることがある
+timeout = int(os.environ.get('QIITA_WORKER_TIMEOUT', '120'))
+# 停止時（SIGTERM）は処理中のダウンロードが終わるまでこの秒数だけ待つ
+graceful_timeout = int(os.environ.get('QIITA_GRACEFUL_TIMEOUT', '60'))
+keepalive = 5
+
+# 重いモジュールをフォーク前に一度だけ読み込む
+preload_app = True
+
+# メモリの断片化対策として一定数のリクエストごとにワーカーを入れ替える（0 で無効）
+max_requests = int(os.environ.get('QIITA_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-' if os.environ.get('QIITA_ACCESS_LOG', '0') == '1' else None
+
+
+def _clear_metrics():
+    directory = os.environ['QIITA_METRICS_DIR']
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            os.remove(os.path.join(directory, name))
+
+
+def on_starting(server):
+    """Start from zero: counters left by a previous run would otherwise be added in."""
+    _clear_metrics()
+
+
+def on_exit(server):
+    _clear_metrics()
+
+
+def worker_exit(server, worker):
+    """Let running background jobs of this worker finish before it exits; queued ones are failed.
+
+    The worker's final metrics are written so its counters keep counting
+    after it is replaced.
+    """
+    from src.utils import metrics
+    from src.utils.job_queue import shutdown_job_queue
+    shutdown_job_queue(wait=True)
+    if metrics.METRICS_DIR:
+        try:
+            metrics.write_snapshot()
+        except OSError:
+            pass
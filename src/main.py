@@ -3,48 +3,102 @@ import sys
 # DON'T CHANGE THIS !!!
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from flask import Flask, send_from_directory
+import threading
+
+from flask import Flask, request
 from flask_cors import CORS
 from src.models.user import db
+# 記事の解析に使う重いモジュールは各ルートが使うときに読み込む
 from src.routes.user import user_bp
 from src.routes.download import download_bp
+from src.routes.batch import batch_bp
+from src.routes.jobs import jobs_bp
+from src.routes.sync import sync_bp
+from src.routes.archive import archive_bp
 from src.routes.health import health_bp
-from src.routes.debug import debug_bp
+from src.routes.metrics import metrics_bp
+from src.utils import log_config
+from src.utils.static_files import StaticManifest, send_static_file
+
+# ログ設定（QIITA_LOG_LEVEL / QIITA_LOG_FORMAT）
+log_config.configure_logging()
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+log_config.init_app(app)
 
 # CORS設定を追加
 CORS(app)
 
+# デバッグ用のエンドポイント（/api/debug/*）を登録する（本番では 0 を推奨）
+DEBUG_ROUTES = os.environ.get('QIITA_DEBUG_ROUTES', '1') == '1'
+
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(download_bp, url_prefix='/api')
+app.register_blueprint(batch_bp, url_prefix='/api')
+app.register_blueprint(jobs_bp, url_prefix='/api')
+app.register_blueprint(sync_bp, url_prefix='/api')
+app.register_blueprint(archive_bp, url_prefix='/api')
 app.register_blueprint(health_bp, url_prefix='/api')
-app.register_blueprint(debug_bp, url_prefix='/api')
+app.register_blueprint(metrics_bp, url_prefix='/api')
+if DEBUG_ROUTES:
+    from src.routes.debug import debug_bp
+    app.register_blueprint(debug_bp, url_prefix='/api')
 
 # uncomment if you need to use database
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 db.init_app(app)
-with app.app_context():
-    db.create_all()
+
+_database_ready = False
+_database_lock = threading.Lock()
+
+
+def init_database():
+    """Create missing tables; runs once per process.
+
+    Kept out of the import path: the entry points (``src/wsgi.py`` before
+    forking, ``python src/main.py``) call it at startup, and otherwise the
+    first request does.
+    """
+    global _database_ready
+    if _database_ready:
+        return
+    with _database_lock:
+        if _database_ready:
+            return
+        with app.app_context():
+            db.create_all()
+            # フォーク後のワーカーが親プロセスの接続を使い回さないよう閉じておく
+            db.engine.dispose()
+        _database_ready = True
+
+
+@app.before_request
+def _ensure_database():
+    init_database()
+
+# 静的ファイルの一覧は起動時に作り、リクエストごとにファイルシステムを確認しない
+static_files = StaticManifest(app.static_folder)
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
 def serve(path):
-    static_folder_path = app.static_folder
-    if static_folder_path is None:
-            return "Static folder not configured", 404
-
-    if path != "" and os.path.exists(os.path.join(static_folder_path, path)):
-        return send_from_directory(static_folder_path, path)
-    else:
-        index_path = os.path.join(static_folder_path, 'index.html')
-        if os.path.exists(index_path):
-            return send_from_directory(static_folder_path, 'index.html')
-        else:
+    if app.static_folder is None:
+        return "Static folder not configured", 404
+
+    if app.debug:
+        # 開発中は編集したファイルをすぐ反映する
+        static_files.build()
+    static_file = static_files.get(path) if path != "" else None
+    if static_file is None:
+        static_file = static_files.get('index.html')
+        if static_file is None:
             return "index.html not found", 404
+    return send_static_file(request, static_file)
 
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    # 開発用サーバー（本番は gunicorn src.wsgi:app で起動する）
+    init_database()
+    app.run(host='0.0.0.0', port=5001, debug=os.environ.get('QIITA_DEBUG', '1') == '1')
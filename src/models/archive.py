@@ -0,0 +1,70 @@
+import logging
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from src.models.user import db
+
+logger = logging.getLogger(__name__)
+
+# 全文検索用のFTS5インデックス（日本語を扱えるよう trigram で分割する）
+SEARCH_INDEX_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS archived_article_fts USING fts5("
+    "title, markdown, content='archived_article', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS archived_article_ai AFTER INSERT ON archived_article BEGIN "
+    "INSERT INTO archived_article_fts(rowid, title, markdown) VALUES (new.id, new.title, new.markdown); END",
+    "CREATE TRIGGER IF NOT EXISTS archived_article_ad AFTER DELETE ON archived_article BEGIN "
+    "INSERT INTO archived_article_fts(archived_article_fts, rowid, title, markdown) "
+    "VALUES ('delete', old.id, old.title, old.markdown); END",
+    "CREATE TRIGGER IF NOT EXISTS archived_article_au AFTER UPDATE OF title, markdown ON archived_article BEGIN "
+    "INSERT INTO archived_article_fts(archived_article_fts, rowid, title, markdown) "
+    "VALUES ('delete', old.id, old.title, old.markdown); "
+    "INSERT INTO archived_article_fts(rowid, title, markdown) VALUES (new.id, new.title, new.markdown); END",
+)
+
+class ArchivedArticle(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(2048), nullable=False, unique=True)
+    item_id = db.Column(db.String(32), index=True)
+    author = db.Column(db.String(255), index=True)
+    title = db.Column(db.String(255), nullable=False)
+    markdown = db.Column(db.Text, nullable=False)
+    etag = db.Column(db.String(255))
+    last_modified = db.Column(db.String(64))
+    zip_path = db.Column(db.String(1024))
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ArchivedArticle {self.url}>'
+
+    def validators(self):
+        """Conditional request headers for the stored ETag / Last-Modified."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_dict(self, markdown=False):
+        data = {
+            'id': self.id,
+            'url': self.url,
+            'item_id': self.item_id,
+            'author': self.author,
+            'title': self.title,
+            'archived_at': self.archived_at.isoformat() if self.archived_at else None,
+            'has_zip': bool(self.zip_path),
+        }
+        if markdown:
+            data['markdown'] = self.markdown
+        return data
+
+
+@event.listens_for(ArchivedArticle.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    try:
+        for statement in SEARCH_INDEX_DDL:
+            connection.exec_driver_sql(statement)
+    except OperationalError as e:
+        # FTS5がないSQLiteでは検索はLIKEでの全件走査になる
+        logger.warning("Full-text index not available: %s", e)
@@ -0,0 +1,41 @@
+from datetime import datetime
+from src.models.user import db
+
+class DownloadJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)
+    url = db.Column(db.String(2048), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    stage = db.Column(db.String(32), nullable=False, default='queued')
+    images_done = db.Column(db.Integer, nullable=False, default=0)
+    images_total = db.Column(db.Integer, nullable=False, default=0)
+    bytes_written = db.Column(db.Integer, nullable=False, default=0)
+    title = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    artifact_path = db.Column(db.String(1024))
+    worker = db.Column(db.String(255))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    expires_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<DownloadJob {self.id} {self.status}>'
+
+    @property
+    def finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'url': self.url,
+            'status': self.status,
+            'stage': self.stage,
+            'images_done': self.images_done,
+            'images_total': self.images_total,
+            'bytes_written': self.bytes_written,
+            'title': self.title,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        }
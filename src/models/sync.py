@@ -0,0 +1,49 @@
+import json
+from datetime import datetime
+from src.models.user import db
+
+class SyncedArticle(db.Model):
+    __table_args__ = (db.UniqueConstraint('source', 'item_id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    source = db.Column(db.String(255), nullable=False, index=True)
+    item_id = db.Column(db.String(32), nullable=False)
+    url = db.Column(db.String(2048), nullable=False)
+    title = db.Column(db.String(255))
+    path = db.Column(db.String(1024))
+    updated_at = db.Column(db.String(64))
+    etag = db.Column(db.String(255))
+    last_modified = db.Column(db.String(64))
+    image_hashes = db.Column(db.Text, nullable=False, default='{}')
+    synced_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SyncedArticle {self.source} {self.item_id}>'
+
+    @property
+    def images(self):
+        """Mapping of image file name to SHA-256 hex digest."""
+        return json.loads(self.image_hashes or '{}')
+
+    @images.setter
+    def images(self, value):
+        self.image_hashes = json.dumps(value, sort_keys=True)
+
+    def validators(self):
+        """Conditional request headers for the stored ETag / Last-Modified."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def to_dict(self):
+        return {
+            'item_id': self.item_id,
+            'url': self.url,
+            'title': self.title,
+            'path': self.path,
+            'updated_at': self.updated_at,
+            'synced_at': self.synced_at.isoformat() if self.synced_at else None,
+        }
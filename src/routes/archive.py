@@ -0,0 +1,37 @@
+import logging
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+from src.models.user import db
+from src.models.archive import ArchivedArticle
+from src.utils import article_archive
+
+archive_bp = Blueprint('archive', __name__)
+
+logger = logging.getLogger(__name__)
+
+
+@archive_bp.route('/archive/search', methods=['GET'])
+@cross_origin()
+def search_archive():
+    """アーカイブした記事を全文検索（関連度順・ページ分割）"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '検索語を指定してください'}), 400
+    try:
+        page = int(request.args.get('page', 1))
+        per_page = int(request.args.get('per_page', 20))
+    except ValueError:
+        return jsonify({'error': 'page と per_page は整数で指定してください'}), 400
+    page = max(1, page)
+    per_page = max(1, min(per_page, article_archive.ARCHIVE_SEARCH_MAX_PER_PAGE))
+
+    total, results = article_archive.search(query, page=page, per_page=per_page)
+    return jsonify({'query': query, 'total': total, 'page': page, 'per_page': per_page, 'results': results})
+
+
+@archive_bp.route('/archive/<int:article_id>', methods=['GET'])
+@cross_origin()
+def get_archived_article(article_id):
+    """アーカイブした記事のメタデータとMarkdown"""
+    article = db.get_or_404(ArchivedArticle, article_id)
+    return jsonify(article.to_dict(markdown=True))
@@ -0,0 +1,162 @@
+import os
+import json
+import uuid
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, Response, request, jsonify
+from flask_cors import cross_origin
+from src.routes.download import (
+    fetch_article_page, parse_article, iter_article_images, convert_to_markdown
+)
+from src.utils import http_client
+from src.utils.article_cache import normalize_article_url
+from src.utils.image_optimizer import options_from_request
+from src.utils.qiita_api import list_item_urls
+from src.utils.rate_limiter import run_in_flow
+from src.utils.zip_stream import stream_zip, content_disposition
+
+batch_bp = Blueprint('batch', __name__)
+
+logger = logging.getLogger(__name__)
+
+# 同時に変換する記事数と1リクエストあたりの上限
+BATCH_WORKERS = int(os.environ.get('QIITA_BATCH_WORKERS', '4'))
+BATCH_MAX_ARTICLES = int(os.environ.get('QIITA_BATCH_MAX_ARTICLES', '50'))
+
+
+def _shared_image_name(image_count, content, extension):
+    """Name images by content so identical images are stored once per archive."""
+    return f"{hashlib.sha256(content).hexdigest()[:16]}{extension}"
+
+
+@http_client.byte_budget()
+def render_article(url, optimize=None, stats=None):
+    """Fetch and convert one article. Returns (title, markdown, images).
+
+    Each article gets its own download budget.
+    """
+    page_response = fetch_article_page(url)
+    title, content_div = parse_article(page_response)
+    images = list(iter_article_images(
+        url, content_div, src_prefix="../images", name_image=_shared_image_name,
+        optimize=optimize, stats=stats
+    ))
+    markdown_content = convert_to_markdown(content_div)
+    return title, markdown_content, images
+
+
+def iter_batch_entries(urls, optimize=None):
+    """Yield ZIP entries for all articles followed by ``manifest.json``.
+
+    Articles are converted in parallel and written in request order; images
+    shared between articles are written once under ``images/``.
+    """
+    manifest = []
+    written_images = set()
+    used_titles = set()
+    # 一括ダウンロード全体を1つのフローとして、他のダウンロードと交互に送信させる
+    batch_flow = f"batch-{uuid.uuid4().hex[:8]}"
+
+    with ThreadPoolExecutor(max_workers=min(BATCH_WORKERS, len(urls))) as executor:
+        stats = [{} for _ in urls]
+        futures = [
+            executor.submit(run_in_flow, batch_flow, render_article, url, optimize, article_stats)
+            for url, article_stats in zip(urls, stats)
+        ]
+        for url, future, article_stats in zip(urls, futures, stats):
+            try:
+                title, markdown_content, images = future.result()
+            except Exception as e:
+                logger.warning("Batch article failed: %s: %s", url, e)
+                manifest.append({'url': url, 'status': 'error', 'error': str(e)})
+                continue
+
+            for img_name, content in images:
+                if img_name not in written_images:
+                    written_images.add(img_name)
+                    yield f"images/{img_name}", content
+
+            # 同名の記事はディレクトリ名に連番を付ける
+            dir_name = title
+            suffix = 2
+            while dir_name in used_titles:
+                dir_name = f"{title}_{suffix}"
+                suffix += 1
+            used_titles.add(dir_name)
+
+            yield f"{dir_name}/article.md", markdown_content.encode('utf-8')
+            entry = {
+                'url': url,
+                'status': 'ok',
+                'title': title,
+                'path': f"{dir_name}/article.md",
+                'images': len(images),
+            }
+            if optimize is not None:
+                entry['image_bytes_saved'] = (
+                    article_stats.get('original_bytes', 0) - article_stats.get('output_bytes', 0)
+                )
+            manifest.append(entry)
+
+    summary = {
+        'succeeded': sum(1 for entry in manifest if entry['status'] == 'ok'),
+        'failed': sum(1 for entry in manifest if entry['status'] == 'error'),
+        'articles': manifest,
+    }
+    yield 'manifest.json', json.dumps(summary, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+@batch_bp.route('/batch-download', methods=['POST'])
+@cross_origin()
+def batch_download():
+    """複数の記事を1つのZIPにまとめてダウンロード"""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'JSONの解析に失敗しました'}), 400
+
+    try:
+        limit = int(data.get('limit', BATCH_MAX_ARTICLES))
+        if limit < 1:
+            raise ValueError(limit)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limitは1以上の整数で指定してください'}), 400
+    limit = min(limit, BATCH_MAX_ARTICLES)
+
+    try:
+        optimize = options_from_request(data.get('optimize_images'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if data.get('source'):
+        source = data['source']
+        if not isinstance(source, str) or 'qiita.com' not in source:
+            return jsonify({'error': 'QiitaのURLを入力してください'}), 400
+        try:
+            urls = list_item_urls(source, limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logger.error("Failed to list articles: %s", e)
+            return jsonify({'error': f'記事一覧の取得に失敗しました: {str(e)}'}), 500
+    else:
+        urls = data.get('urls')
+        if not isinstance(urls, list) or not urls:
+            return jsonify({'error': 'URLが指定されていません'}), 400
+        if not all(isinstance(url, str) and 'qiita.com' in url for url in urls):
+            return jsonify({'error': 'QiitaのURLを入力してください'}), 400
+
+    # 同じ記事を重複して取得しない
+    unique_urls = {}
+    for url in urls:
+        unique_urls.setdefault(normalize_article_url(url), url)
+    urls = list(unique_urls.values())[:limit]
+    if not urls:
+        return jsonify({'error': '記事が見つかりませんでした'}), 404
+
+    logger.info("Batch download: %s articles", len(urls))
+    return Response(
+        stream_zip(iter_batch_entries(urls, optimize)),
+        mimetype='application/zip',
+        headers={'Content-Disposition': content_disposition('qiita_articles.zip')}
+    )
@@ -4,6 +4,7 @@ import sys
 import os
 import traceback
 import tempfile
+from src.utils import preload
 
 debug_bp = Blueprint('debug', __name__)
 
@@ -12,11 +13,8 @@ debug_bp = Blueprint('debug', __name__)
 def debug_info():
     """デバッグ情報を返すエンドポイント"""
     try:
-        import requests
-        import bs4
-        import markdownify
-        import zipfile
-        
+        versions = preload.dependency_status()
+
         return jsonify({
             'status': 'ok',
             'python_version': sys.version,
@@ -27,11 +25,7 @@ def debug_info():
                 'PATH': os.environ.get('PATH', 'Not set'),
                 'PYTHONPATH': os.environ.get('PYTHONPATH', 'Not set'),
             },
-            'modules': {
-                'requests': requests.__version__,
-                'bs4': bs4.__version__,
-                'markdownify': getattr(markdownify, '__version__', 'version not available'),
-            }
+            'modules': versions
         }), 200
     except Exception as e:
         return jsonify({
@@ -83,8 +77,8 @@ def test_request():
 def simple_download():
     """簡単なダウンロードテスト"""
     try:
-        import requests
         from bs4 import BeautifulSoup
+        from src.utils import http_client
         
         data = request.get_json()
         if not data or 'url' not in data:
@@ -93,7 +87,7 @@ def simple_download():
         url = data['url']
         
         # 単純なHTTPリクエストのテスト
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url, timeout=10)
         response.raise_for_status()
         
         # HTMLの解析テスト
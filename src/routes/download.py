@@ -1,23 +1,83 @@
 import os
 import re
+import json
+import importlib.util
+import logging
 import tempfile
 import zipfile
 import shutil
 import requests
-from bs4 import BeautifulSoup
-from markdownify import markdownify as md
 from urllib.parse import urljoin, urlparse
-from flask import Blueprint, request, jsonify, send_file
+from flask import Blueprint, Response, g, request, jsonify, send_file, stream_with_context
 from flask_cors import cross_origin
+from src.utils import article_archive, http_client, metrics, qiita_api
+from src.utils.article_cache import get_article_cache, normalize_article_url
+from src.utils.exporters import ExportArticle, export_entries, formats_from_request, formats_variant
+from src.utils.image_fetcher import iter_images
+from src.utils.image_optimizer import optimize_images, options_from_request
+from src.utils.markdown_normalizer import normalize_markdown
+from src.utils.qiita_api import MarkdownBody
+from src.utils.single_flight import SingleFlight, SharedFile
+from src.utils.zip_stream import stream_zip, content_disposition
 
 download_bp = Blueprint('download', __name__)
 
+
+@download_bp.before_app_request
+def _start_byte_budget():
+    # 1リクエストで取得できる合計バイト数を制限する（ストリーミング中も有効）
+    g.byte_budget_token = http_client.start_byte_budget()
+
+
+@download_bp.teardown_app_request
+def _end_byte_budget(exc):
+    token = g.pop('byte_budget_token', None)
+    if token is not None:
+        http_client.end_byte_budget(token)
+
+logger = logging.getLogger(__name__)
+
+# ZIPを一時ディレクトリに作らず、生成しながらレスポンスに書き出す
+STREAM_ZIP = os.environ.get('QIITA_STREAM_ZIP', '1') == '1'
+
+# 記事の取得方法: api（Qiita API v2）/ html（ページのスクレイピング）/ auto（トークンがあればapi）
+INGEST_MODE = os.environ.get('QIITA_INGEST_MODE', 'auto')
+
+def _default_html_parser():
+    # 読み込むと起動が遅くなるため、インストールされているかだけを確認する
+    return 'lxml' if importlib.util.find_spec('lxml') is not None else 'html.parser'
+
+# HTMLパーサー（lxml がインストールされていれば既定で使う）
+HTML_PARSER = os.environ.get('QIITA_HTML_PARSER') or _default_html_parser()
+
+# タイトルと本文だけを木構造にする（ナビゲーションやスクリプトは読み飛ばす）
+SCOPED_PARSE = os.environ.get('QIITA_SCOPED_PARSE', '1') == '1'
+_ARTICLE_TAGS = ['h1', 'section']
+
+def parse_html(html, parser=None, scoped=None):
+    """Build a BeautifulSoup tree of an article page.
+
+    With ``scoped`` only ``<h1>`` and ``<section>`` elements are kept, which is
+    all ``parse_article`` needs.
+    """
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    parser = parser or HTML_PARSER
+    scoped = SCOPED_PARSE if scoped is None else scoped
+    return BeautifulSoup(html, parser, parse_only=SoupStrainer(_ARTICLE_TAGS) if scoped else None)
+
 def sanitize_filename(title):
     """Remove characters that cannot be used in filenames."""
     return re.sub(r'[\\/*?:">>"<>|]', "", title)
 
-def get_image_extension(url, content_type=None):
-    """Get image file extension from URL or content type."""
+def get_image_extension(url, content_type=None, output_format=None):
+    """Get image file extension from URL or content type.
+
+    ``output_format`` (set when an image was re-encoded) takes precedence.
+    """
+    if output_format:
+        return '.jpg' if output_format == 'jpeg' else f'.{output_format}'
+
     # Try to get extension from URL first
     parsed_url = urlparse(url)
     path = parsed_url.path.lower()
@@ -54,21 +114,59 @@ def get_image_extension(url, content_type=None):
     # Default to .jpg if cannot determine
     return '.jpg'
 
-def download_qiita_article(url, output_dir="."):
-    """Download a Qiita article as Markdown."""
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    logger.info(f"Fetching article from: {url}")
+def _use_api():
+    if INGEST_MODE == 'auto':
+        return bool(qiita_api.QIITA_ACCESS_TOKEN)
+    return INGEST_MODE == 'api'
+
+@metrics.timed('fetch_page')
+def fetch_article_page(url, headers=None):
+    """Fetch the article. A 304 is returned as-is for conditional requests.
+
+    In API mode the item JSON is fetched from the Qiita API; the HTML page is
+    only scraped when the API cannot serve the article.
+    """
+    item_id = qiita_api.extract_item_id(url) if _use_api() else None
+    if item_id:
+        logger.debug("Fetching item from Qiita API: %s", item_id)
+        try:
+            response = qiita_api.fetch_item(item_id, headers=headers)
+            if response.status_code == 304 or response.ok:
+                metrics.BYTES_FETCHED.inc(len(response.content), kind='page')
+                return response
+            metrics.UPSTREAM_ERRORS.inc(kind='api')
+            logger.warning("Qiita API returned %s, falling back to HTML", response.status_code)
+        except requests.exceptions.RequestException as e:
+            metrics.UPSTREAM_ERRORS.inc(kind='api')
+            logger.warning("Qiita API request failed, falling back to HTML: %s", e)
+
+    logger.debug("Fetching article from: %s", url)
     try:
-        response = requests.get(url, timeout=30)
-        response.raise_for_status()
-        logger.info(f"Successfully fetched article, status: {response.status_code}")
+        response = http_client.get(url, headers=headers, max_bytes=http_client.MAX_PAGE_BYTES)
+        if response.status_code != 304:
+            response.raise_for_status()
+        logger.debug("Successfully fetched article, status: %s", response.status_code)
     except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to fetch article: {e}")
+        metrics.UPSTREAM_ERRORS.inc(kind='page')
+        logger.error("Failed to fetch article: %s", e)
         raise Exception(f"Error fetching article: {e}")
+    metrics.BYTES_FETCHED.inc(len(response.content), kind='page')
+    return response
+
+@metrics.timed('parse')
+def parse_article(response):
+    """Parse a fetched article and return (sanitized_title, content).
+
+    ``content`` is the ``it-MdContent`` section of an HTML page, or a
+    ``MarkdownBody`` when the article came from the Qiita API.
+    """
+    if response.headers.get('Content-Type', '').startswith('application/json'):
+        item = response.json()
+        title = (item.get('title') or '').strip() or "qiita_article"
+        logger.debug("Found article title: %s", title)
+        return sanitize_filename(title), MarkdownBody(item.get('body') or '', html=item.get('rendered_body'))
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    soup = parse_html(response.content)
 
     # --- Find and sanitize article title ---
     title_tag = soup.find('h1', attrs={'data-logly-title': 'true'})
@@ -81,18 +179,9 @@ def download_qiita_article(url, output_dir="."):
         title = "qiita_article"
     else:
         title = title_tag.get_text().strip()
-        logger.info(f"Found article title: {title}")
+        logger.debug("Found article title: %s", title)
 
     sanitized_title = sanitize_filename(title)
-    
-    # --- Create output directory for the article ---
-    article_output_dir = os.path.join(output_dir, sanitized_title)
-    os.makedirs(article_output_dir, exist_ok=True)
-    logger.info(f"Created article directory: {article_output_dir}")
-    
-    md_filename = os.path.join(article_output_dir, "article.md")
-    images_dir = os.path.join(article_output_dir, "images")
-    os.makedirs(images_dir, exist_ok=True)
 
     # --- Find article content ---
     content_div = soup.find('section', class_='it-MdContent')
@@ -100,97 +189,448 @@ def download_qiita_article(url, output_dir="."):
         logger.error("Could not find article content.")
         raise Exception("Could not find article content.")
 
-    # --- Download images and update paths ---
-    logger.info("Downloading images...")
+    return sanitized_title, content_div
+
+def _html_src_setter(img_tag):
+    def set_src(src):
+        img_tag['src'] = src
+        # If the image is wrapped in a link, unwrap it to prevent linked markdown image
+        if img_tag.parent.name == 'a':
+            img_tag.parent.unwrap()
+    return set_src
+
+def iter_article_images(url, content_div, src_prefix="images", name_image=None, progress=None,
+                        optimize=None, stats=None, checkpoint=None):
+    """Download the images in ``content_div`` and point their ``src`` at local files.
+
+    Yields ``(img_name, content)`` in document order as soon as each image is available.
+    ``name_image(image_count, content, extension)`` overrides the default
+    ``image_001.png`` style names, and ``progress(done, total)`` is called as
+    each image finishes, whether it succeeded or not. With ``optimize``
+    (ImageOptions) images are re-encoded and byte counts are added to ``stats``,
+    as is the number of images that could not be fetched (``failed_images``) and
+    how many of them failed with an error that may go away (``transient_failed_images``).
+    ``checkpoint`` (``JobCheckpoint``) keeps fetched images across job retries.
+    """
+    logger.debug("Downloading images...")
+    if isinstance(content_div, MarkdownBody):
+        image_refs = content_div.image_refs()
+    else:
+        image_refs = [(img_tag.get('src'), _html_src_setter(img_tag)) for img_tag in content_div.find_all('img')]
+    img_entries = [(set_src, urljoin(url, img_url)) for img_url, set_src in image_refs if img_url]
+
+    # Fetch concurrently, then number and rewrite in document order
+    errors = {}
+    results = iter_images([img_url for _, img_url in img_entries], checkpoint=checkpoint, errors=errors)
+    if optimize is not None:
+        results = optimize_images(results, optimize, stats)
+
     image_count = 0
-    for img_tag in content_div.find_all('img'):
-        img_url = img_tag.get('src')
-        if not img_url:
+    for done, ((set_src, img_url), result) in enumerate(zip(img_entries, results), 1):
+        if progress is not None:
+            progress(done, len(img_entries))
+        if result is None:
+            if stats is not None:
+                stats['failed_images'] = stats.get('failed_images', 0) + 1
+                if http_client.is_transient(errors.get(img_url)):
+                    stats['transient_failed_images'] = stats.get('transient_failed_images', 0) + 1
             continue
+        content, content_type = result[0], result[1]
+        output_format = result[2] if len(result) > 2 else None
 
-        img_url = urljoin(url, img_url)
-        
-        try:
-            img_response = requests.get(img_url, stream=True, timeout=30)
-            img_response.raise_for_status()
-
-            # Generate short filename with counter
-            image_count += 1
-            img_extension = get_image_extension(img_url, img_response.headers.get('Content-Type'))
+        # Generate short filename with counter
+        image_count += 1
+        img_extension = get_image_extension(img_url, content_type, output_format)
+        if name_image is None:
             img_name = f"image_{image_count:03d}{img_extension}"
-            
-            img_local_path = os.path.join(images_dir, img_name)
-            
-            with open(img_local_path, 'wb') as f:
-                for chunk in img_response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            
-            # Update the src to be a relative path for portability
-            img_local_relative_path = os.path.join("images", img_name)
-            img_tag['src'] = img_local_relative_path
-            logger.debug(f"Downloaded image: {img_name}")
+        else:
+            img_name = name_image(image_count, content, img_extension)
 
-            # If the image is wrapped in a link, unwrap it to prevent linked markdown image
-            if img_tag.parent.name == 'a':
-                img_tag.parent.unwrap()
+        # Update the src to be a relative path for portability
+        img_local_relative_path = os.path.join(src_prefix, img_name)
+        set_src(img_local_relative_path)
+        logger.debug("Downloaded image: %s", img_name)
 
-        except requests.exceptions.RequestException as e:
-            logger.warning(f"Failed to download {img_url}: {e}")
+        yield img_name, content
 
-    logger.info(f"Downloaded {image_count} images")
+    metrics.IMAGES_PER_ARTICLE.observe(image_count)
+    logger.info("Downloaded %d images", image_count)
 
-    # --- Convert HTML to Markdown ---
-    logger.info("Converting to Markdown...")
+def convert_to_markdown(content_div):
+    """Convert the article content to cleaned-up Markdown."""
+    # Articles from the Qiita API are already Markdown
+    if isinstance(content_div, MarkdownBody):
+        return content_div.render()
+
+    from markdownify import markdownify as md
+
+    logger.debug("Converting to Markdown...")
     # Use the modified HTML string for conversion
-    markdown_content = md(str(content_div), heading_style="ATX")
-    
-    # Fix heading spacing: ensure there's a space after # symbols
-    markdown_content = re.sub(r'^(#{1,6})([^\s#])', r'\1 \2', markdown_content, flags=re.MULTILINE)
-    
-    # Also fix cases where there might be multiple spaces or tabs
-    markdown_content = re.sub(r'^(#{1,6})\s+', r'\1 ', markdown_content, flags=re.MULTILINE)
+    # Asterisks are left unescaped so that emphasis Qiita failed to render
+    # (literal "**" in the HTML) is restored; code is never escaped.
+    with metrics.timed('markdownify'):
+        markdown_content = md(str(content_div), heading_style="ATX", escape_asterisks=False)
+
+    # Fix heading and emphasis spacing outside code blocks
+    with metrics.timed('normalize'):
+        markdown_content = normalize_markdown(markdown_content)
+
+    return markdown_content
+
+def _uses_exporters(formats):
+    """True if ``formats`` asks for more than the default ``article.md`` + ``images/``."""
+    return formats is not None and formats != ('markdown',)
+
+def download_qiita_article(url, output_dir=".", response=None, optimize=None, stats=None, formats=None):
+    """Download a Qiita article as Markdown.
+
+    ``response`` may be an already fetched article page to avoid a second request.
+    ``optimize`` and ``stats`` are passed on to ``iter_article_images``.
+    ``formats`` (names of exporters) writes those outputs instead.
+    """
+    if response is None:
+        response = fetch_article_page(url)
+
+    sanitized_title, content_div = parse_article(response)
     
-    # Fix escaped asterisks in bold/italic formatting
-    # Convert \*\* back to ** for bold text
-    markdown_content = re.sub(r'\\(\*\*)', r'\1', markdown_content)
-    # Convert \* back to * for italic text (but not if it's part of **)
-    markdown_content = re.sub(r'(?<!\\)\\(\*)(?!\*)', r'\1', markdown_content)
-    # Handle cases where single asterisks are escaped
-    markdown_content = re.sub(r'\\(\*)', r'\1', markdown_content)
+    # --- Create output directory for the article ---
+    article_output_dir = os.path.join(output_dir, sanitized_title)
+    os.makedirs(article_output_dir, exist_ok=True)
+    logger.debug("Created article directory: %s", article_output_dir)
+
+    if _uses_exporters(formats):
+        images = list(iter_article_images(url, content_div, optimize=optimize, stats=stats))
+        article = ExportArticle(url, sanitized_title, content_div, images, convert_to_markdown)
+        for path, data in export_entries(article, formats):
+            file_path = os.path.join(article_output_dir, path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, 'wb') as f:
+                f.write(data)
+        logger.info("Exported article as %s to '%s'", ', '.join(formats), article_output_dir)
+        return article_output_dir, sanitized_title
     
-    # Fix emphasis markers followed by punctuation (e.g., "**text(内容)**" -> "**text(内容)** ")
-    # Add space after ** when it's followed by text or at end of emphasis
-    markdown_content = re.sub(r'(\*\*[^*]+\*\*)([^\s])', r'\1 \2', markdown_content)
-    # Add space after * when it's followed by text (but not if it's part of **)
-    markdown_content = re.sub(r'(?<!\*)(\*[^*]+\*)(?!\*)([^\s])', r'\1 \2', markdown_content)
+    md_filename = os.path.join(article_output_dir, "article.md")
+    images_dir = os.path.join(article_output_dir, "images")
+    os.makedirs(images_dir, exist_ok=True)
+
+    # --- Download images and update paths ---
+    for img_name, content in iter_article_images(url, content_div, optimize=optimize, stats=stats):
+        with open(os.path.join(images_dir, img_name), 'wb') as f:
+            f.write(content)
+
+    # --- Convert HTML to Markdown ---
+    markdown_content = convert_to_markdown(content_div)
     
     # --- Save Markdown file ---
     with open(md_filename, 'w', encoding='utf-8') as f:
         f.write(markdown_content)
 
-    logger.info(f"Successfully downloaded article to '{article_output_dir}'")
+    logger.info("Successfully downloaded article to '%s'", article_output_dir)
     return article_output_dir, sanitized_title
 
+def iter_article_entries(url, article_title, content_div, rendered, progress=None, optimize=None,
+                         formats=None, checkpoint=None):
+    """Yield ``(arcname, data)`` ZIP entries for an article, images first.
+
+    The final Markdown is also stored in ``rendered['markdown']``, and image
+    byte counts in ``rendered['original_bytes']``/``rendered['output_bytes']``.
+    With ``optimize`` those counts are also written last, as
+    ``image_optimization.json``, since a streamed response cannot add the
+    ``X-Image-Bytes-Saved`` header once they are known.
+    With ``formats`` every exporter's files are produced from the same parse
+    and images; ``rendered['markdown']`` is then set only if one needed it.
+    """
+    images = iter_article_images(
+        url, content_div, progress=progress, optimize=optimize, stats=rendered, checkpoint=checkpoint
+    )
+    if _uses_exporters(formats):
+        article = ExportArticle(url, article_title, content_div, list(images), convert_to_markdown)
+        for path, data in export_entries(article, formats):
+            yield f"{article_title}/{path}", data
+        if article.rendered_markdown is not None:
+            rendered['markdown'] = article.rendered_markdown
+    else:
+        for img_name, content in images:
+            yield f"{article_title}/images/{img_name}", content
+        rendered['markdown'] = convert_to_markdown(content_div)
+        yield f"{article_title}/article.md", rendered['markdown'].encode('utf-8')
+    if optimize is not None:
+        original, output = rendered.get('original_bytes', 0), rendered.get('output_bytes', 0)
+        summary = {'original_bytes': original, 'output_bytes': output, 'bytes_saved': original - output}
+        yield f"{article_title}/image_optimization.json", json.dumps(summary, indent=2).encode('utf-8')
+
+def _send_cached_article(entry):
+    """Send a cached ZIP, or return None if it was evicted in the meantime."""
+    try:
+        zip_file = open(entry.zip_path, 'rb')
+    except OSError:
+        return None
+    return send_file(
+        zip_file,
+        as_attachment=True,
+        download_name=f"{entry.title}.zip",
+        mimetype='application/zip'
+    )
+
+def _send_archived_article(url, archived):
+    """Send the archived ZIP unless upstream has changed the article.
+
+    Returns ``(response, page_response)``: when the article changed the
+    fetched page is returned instead so it is not fetched twice, and both
+    are None when the archive cannot be used.
+    """
+    validators = archived.validators()
+    if not validators:
+        return None, None
+    try:
+        page_response = fetch_article_page(url, headers=validators)
+    except Exception as revalidate_error:
+        # qiita.com に接続できない場合もアーカイブから返す
+        logger.warning("Archive revalidation failed: %s", revalidate_error)
+        page_response = None
+    if page_response is not None and page_response.status_code != 304:
+        return None, page_response
+    try:
+        zip_file = open(archived.zip_path, 'rb')
+    except OSError:
+        return None, None
+    logger.info("Serving archived article: %s", archived.url)
+    return send_file(
+        zip_file,
+        as_attachment=True,
+        download_name=f"{archived.title}.zip",
+        mimetype='application/zip'
+    ), None
+
+def _stream_article_zip(url, article_title, content_div, page_headers, article_cache,
+                        optimize=None, cache_variant='', waiting=None, formats=None):
+    """Stream the article ZIP while images are still being downloaded.
+
+    The finished ZIP is also stored in the article cache and handed to
+    ``waiting`` (``_WaitingRequests``).
+    """
+    rendered = {}
+    def generate():
+        entries = iter_article_entries(
+            url, article_title, content_div, rendered, optimize=optimize, formats=formats
+        )
+        if not article_cache.enabled and waiting is None:
+            yield from stream_zip(entries)
+            return
+
+        # キャッシュと待機中のリクエスト用に送信内容を一時ファイルへも書き出す
+        temp_dir = tempfile.mkdtemp()
+        zip_path = os.path.join(temp_dir, f"{article_title}.zip")
+        md_path = None
+        completed = shared = False
+        try:
+            with open(zip_path, 'wb') as zip_file:
+                for chunk in stream_zip(entries):
+                    zip_file.write(chunk)
+                    yield chunk
+            completed = True
+            if 'markdown' in rendered:
+                md_path = os.path.join(temp_dir, 'article.md')
+                with open(md_path, 'w', encoding='utf-8') as md_file:
+                    md_file.write(rendered['markdown'])
+            if article_cache.enabled:
+                article_cache.put(url, article_title, zip_path, md_path, page_headers, variant=cache_variant)
+            if 'markdown' in rendered:
+                article_archive.archive_article(
+                    url, article_title, rendered['markdown'], page_headers,
+                    zip_path=zip_path if not cache_variant else None
+                )
+        except OSError as cache_error:
+            logger.warning("Failed to cache article: %s", cache_error)
+        finally:
+            if waiting is not None and completed:
+                shared = waiting.share(zip_path, temp_dir, title=article_title)
+            if not shared:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+
+    # リクエストIDをログに残すため、送信が終わるまでリクエストコンテキストを保持する
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': content_disposition(f"{article_title}.zip")}
+    )
+    if waiting is not None:
+        # 送信が途中で終わった場合も待機中のリクエストを解放する
+        response.call_on_close(lambda: waiting.fail(ArticleBuildError('記事の送信が中断されました')))
+    return response
+
+class ArticleBuildError(Exception):
+    """A failed download, re-raised in the requests that waited for it."""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+_article_flights = SingleFlight()
+
+class _WaitingRequests:
+    """Hands the leader's finished ZIP, or its error, to requests waiting on ``flight``."""
+
+    def __init__(self, key, flight):
+        self.key = key
+        self.flight = flight
+
+    def share(self, zip_path, temp_dir, **info):
+        """Publish the ZIP. Returns True if the waiters took over removing ``temp_dir``."""
+        def publish(waiters):
+            return SharedFile(zip_path, temp_dir, waiters, **info) if waiters else None
+
+        _article_flights.finish(self.key, self.flight, publish=publish)
+        return self.flight.result is not None
+
+    def fail(self, error):
+        _article_flights.finish(self.key, self.flight, error=error)
+
+    def fail_with_response(self, response):
+        """Release the waiters with the same error as an error ``response``, unless already shared."""
+        if self.flight.done:
+            return
+        body, status = response if isinstance(response, tuple) else (response, response.status_code)
+        message = (body.get_json(silent=True) or {}).get('error', 'ダウンロードに失敗しました')
+        self.fail(ArticleBuildError(message, status))
+
+def _send_coalesced_article(flight):
+    """Wait for another request's download of the same article and send its ZIP."""
+    try:
+        shared = flight.wait()
+    except ArticleBuildError as e:
+        return jsonify({'error': e.message}), e.status
+    except Exception as e:
+        return jsonify({'error': f'記事のダウンロードに失敗しました: {str(e)}'}), 500
+    response = send_file(
+        shared.open(),
+        as_attachment=True,
+        download_name=f"{shared.info['title']}.zip",
+        mimetype='application/zip'
+    )
+    if shared.info.get('bytes_saved') is not None:
+        response.headers['X-Image-Bytes-Saved'] = str(shared.info['bytes_saved'])
+    return response
+
+def _build_zip_response(url, page_response, article_cache, optimize, cache_variant, waiting, formats=None):
+    """Build the article ZIP in a temporary directory and send it.
+
+    The finished ZIP is also handed to ``waiting`` (``_WaitingRequests``).
+    """
+    # 一時ディレクトリを作成
+    try:
+        logger.debug("Creating temporary directory...")
+        temp_dir = tempfile.mkdtemp()
+        logger.debug("Created temp directory: %s", temp_dir)
+        shared = False
+        
+        try:
+            # 記事をダウンロード
+            try:
+                if page_response is None:
+                    page_response = fetch_article_page(url)
+                image_stats = {}
+                article_dir, article_title = download_qiita_article(
+                    url, temp_dir, response=page_response, optimize=optimize, stats=image_stats,
+                    formats=formats
+                )
+                logger.debug("Article downloaded successfully to: %s", article_dir)
+                logger.debug("Article title: %s", article_title)
+            except Exception as download_error:
+                logger.exception("Article download failed: %s", download_error)
+                return jsonify({'error': f'記事のダウンロードに失敗しました: {str(download_error)}'}), 500
+            
+            # ZIPファイルを作成
+            zip_filename = f"{article_title}.zip"
+            zip_path = os.path.join(temp_dir, zip_filename)
+            logger.debug("Creating ZIP file: %s", zip_path)
+            
+            try:
+                with metrics.timed('zip'), zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+                    for root, dirs, files in os.walk(article_dir):
+                        for file in files:
+                            file_path = os.path.join(root, file)
+                            # ZIP内でのパスを相対パスにする
+                            arcname = os.path.relpath(file_path, temp_dir)
+                            zipf.write(file_path, arcname)
+                
+                logger.debug("ZIP file created successfully")
+                
+                # ファイルサイズを確認
+                zip_size = os.path.getsize(zip_path)
+                logger.info("Created ZIP for %s: %d bytes", article_title, zip_size)
+
+                try:
+                    md_path = os.path.join(article_dir, 'article.md')
+                    article_cache.put(
+                        url, article_title, zip_path,
+                        md_path if os.path.exists(md_path) else None, page_response.headers,
+                        variant=cache_variant
+                    )
+                except OSError as cache_error:
+                    logger.warning("Failed to cache article: %s", cache_error)
+                if os.path.exists(md_path):
+                    with open(md_path, encoding='utf-8') as md_file:
+                        article_archive.archive_article(
+                            url, article_title, md_file.read(), page_response.headers,
+                            zip_path=zip_path if not cache_variant else None
+                        )
+                
+            except Exception as zip_error:
+                logger.exception("ZIP creation failed: %s", zip_error)
+                return jsonify({'error': f'ZIPファイルの作成に失敗しました: {str(zip_error)}'}), 500
+            
+            # ZIPファイルを送信
+            logger.debug("Sending file: %s", zip_path)
+            
+            try:
+                # 待機中のリクエストに渡す前に開いておく（最後に開いた側が一時ディレクトリを削除する）
+                zip_file = open(zip_path, 'rb')
+                saved = None
+                if optimize is not None:
+                    saved = image_stats.get('original_bytes', 0) - image_stats.get('output_bytes', 0)
+                shared = waiting.share(zip_path, temp_dir, title=article_title, bytes_saved=saved)
+                response = send_file(
+                    zip_file,
+                    as_attachment=True,
+                    download_name=zip_filename,
+                    mimetype='application/zip'
+                )
+                if saved is not None:
+                    response.headers['X-Image-Bytes-Saved'] = str(saved)
+                return response
+            except Exception as send_error:
+                logger.exception("File send failed: %s", send_error)
+                return jsonify({'error': f'ファイルの送信に失敗しました: {str(send_error)}'}), 500
+            
+        except Exception as e:
+            logger.exception("Download error: %s", e)
+            return jsonify({'error': f'ダウンロードに失敗しました: {str(e)}'}), 500
+        finally:
+            # 一時ディレクトリをクリーンアップ（共有した場合は最後の受け手が削除する）
+            try:
+                if not shared:
+                    logger.debug("Cleaning up temporary directory...")
+                    shutil.rmtree(temp_dir)
+                    logger.debug("Temp directory cleaned up")
+            except Exception as cleanup_error:
+                logger.warning("Failed to cleanup temp directory: %s", cleanup_error)
+                
+    except Exception as temp_error:
+        logger.error("Failed to create temp directory: %s", temp_error)
+        return jsonify({'error': '一時ディレクトリの作成に失敗しました'}), 500
+
+
 @download_bp.route('/download', methods=['POST'])
 @cross_origin()
 def download_article():
-    import traceback
-    import logging
-    
-    # ログ設定
-    logging.basicConfig(level=logging.DEBUG)
-    logger = logging.getLogger(__name__)
-    
     try:
-        logger.info("=== DOWNLOAD REQUEST START ===")
-        logger.info("Download request received")
-        
         # リクエストデータの取得
         try:
             data = request.get_json()
-            logger.info(f"Request data received: {data}")
         except Exception as json_error:
-            logger.error(f"Failed to parse JSON: {json_error}")
+            logger.error("Failed to parse JSON: %s", json_error)
             return jsonify({'error': 'JSONの解析に失敗しました'}), 400
         
         if not data or 'url' not in data:
@@ -198,7 +638,7 @@ def download_article():
             return jsonify({'error': 'URLが指定されていません'}), 400
         
         url = data['url']
-        logger.info(f"Processing URL: {url}")
+        logger.info("Processing URL: %s", url)
         
         # URLの簡単な検証
         if not url or not isinstance(url, str):
@@ -209,88 +649,88 @@ def download_article():
             logger.error("Not a Qiita URL")
             return jsonify({'error': 'QiitaのURLを入力してください'}), 400
         
-        # 一時ディレクトリを作成
+        # 画像最適化の設定
         try:
-            logger.info("Creating temporary directory...")
-            temp_dir = tempfile.mkdtemp()
-            logger.info(f"Created temp directory: {temp_dir}")
-            
-            try:
-                # 記事をダウンロード
-                logger.info("=== STARTING ARTICLE DOWNLOAD ===")
-                logger.info("Entering download_article function")
-                logger.info("Starting article download")
-                
-                try:
-                    article_dir, article_title = download_qiita_article(url, temp_dir)
-                    logger.info(f"Article downloaded successfully to: {article_dir}")
-                    logger.info(f"Article title: {article_title}")
-                except Exception as download_error:
-                    logger.error(f"Article download failed: {str(download_error)}")
-                    logger.error(f"Download traceback: {traceback.format_exc()}")
-                    return jsonify({'error': f'記事のダウンロードに失敗しました: {str(download_error)}'}), 500
-                
-                # ZIPファイルを作成
-                logger.info("=== STARTING ZIP CREATION ===")
-                zip_filename = f"{article_title}.zip"
-                zip_path = os.path.join(temp_dir, zip_filename)
-                logger.info(f"Creating ZIP file: {zip_path}")
-                
+            optimize = options_from_request(data.get('optimize_images'))
+        except ValueError as option_error:
+            return jsonify({'error': str(option_error)}), 400
+        # 出力形式（省略時は article.md と images/）
+        try:
+            formats = formats_from_request(data.get('formats'))
+        except ValueError as format_error:
+            return jsonify({'error': str(format_error)}), 400
+        cache_variant = '-'.join(filter(None, [
+            optimize.variant if optimize is not None else '', formats_variant(formats)
+        ]))
+
+        # 生成済みの記事キャッシュを確認
+        article_cache = get_article_cache()
+        page_response = None
+        cached_article = article_cache.get(url, variant=cache_variant)
+        if cached_article is not None:
+            validators = cached_article.validators()
+            if validators:
                 try:
-                    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        for root, dirs, files in os.walk(article_dir):
-                            for file in files:
-                                file_path = os.path.join(root, file)
-                                # ZIP内でのパスを相対パスにする
-                                arcname = os.path.relpath(file_path, temp_dir)
-                                zipf.write(file_path, arcname)
-                                logger.debug(f"Added to ZIP: {arcname}")
-                    
-                    logger.info("ZIP file created successfully")
-                    
-                    # ファイルサイズを確認
-                    zip_size = os.path.getsize(zip_path)
-                    logger.info(f"ZIP file size: {zip_size} bytes")
-                    
-                except Exception as zip_error:
-                    logger.error(f"ZIP creation failed: {str(zip_error)}")
-                    logger.error(f"ZIP traceback: {traceback.format_exc()}")
-                    return jsonify({'error': f'ZIPファイルの作成に失敗しました: {str(zip_error)}'}), 500
-                
-                # ZIPファイルを送信
-                logger.info("=== STARTING FILE SEND ===")
-                logger.info(f"Sending file: {zip_path}")
-                
+                    page_response = fetch_article_page(url, headers=validators)
+                except Exception as revalidate_error:
+                    # 再検証に失敗した場合はTTL内のキャッシュをそのまま返す
+                    logger.warning("Cache revalidation failed: %s", revalidate_error)
+                if page_response is not None and page_response.status_code == 304:
+                    article_cache.mark_revalidated(cached_article)
+                    page_response = None
+                elif page_response is not None:
+                    article_cache.mark_stale(cached_article)
+                    cached_article = None
+
+        if cached_article is not None:
+            cached_response = _send_cached_article(cached_article)
+            if cached_response is not None:
+                logger.info("Serving cached article: %s", cached_article.key)
+                return cached_response
+
+        # アーカイブ済みの記事は、更新されていなければ保存済みのZIPを返す
+        if page_response is None and not cache_variant:
+            archived = article_archive.lookup(url)
+            if archived is not None and archived.zip_path:
+                archived_response, page_response = _send_archived_article(url, archived)
+                if archived_response is not None:
+                    return archived_response
+
+        # 同じ記事への同時リクエストは1回の生成を待ち、そのZIPを共有する
+        flight_key = f"{normalize_article_url(url)}#{cache_variant}"
+        flight, leader = _article_flights.begin(flight_key)
+        if not leader:
+            logger.info("Waiting for in-progress download: %s", url)
+            return _send_coalesced_article(flight)
+        waiting = _WaitingRequests(flight_key, flight)
+
+        try:
+            # ZIPをストリーミングで返す
+            if data.get('stream', STREAM_ZIP):
                 try:
-                    return send_file(
-                        zip_path,
-                        as_attachment=True,
-                        download_name=zip_filename,
-                        mimetype='application/zip'
+                    if page_response is None:
+                        page_response = fetch_article_page(url)
+                    article_title, content_div = parse_article(page_response)
+                except Exception as download_error:
+                    logger.exception("Article download failed: %s", download_error)
+                    response = jsonify({'error': f'記事のダウンロードに失敗しました: {str(download_error)}'}), 500
+                else:
+                    logger.info("Streaming ZIP for: %s", article_title)
+                    return _stream_article_zip(
+                        url, article_title, content_div, page_response.headers, article_cache,
+                        optimize=optimize, cache_variant=cache_variant, waiting=waiting, formats=formats
                     )
-                except Exception as send_error:
-                    logger.error(f"File send failed: {str(send_error)}")
-                    logger.error(f"Send traceback: {traceback.format_exc()}")
-                    return jsonify({'error': f'ファイルの送信に失敗しました: {str(send_error)}'}), 500
-                
-            except Exception as e:
-                logger.error(f"Download error: {str(e)}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
-                return jsonify({'error': f'ダウンロードに失敗しました: {str(e)}'}), 500
-            finally:
-                # 一時ディレクトリをクリーンアップ
-                try:
-                    logger.info("Cleaning up temporary directory...")
-                    shutil.rmtree(temp_dir)
-                    logger.info("Temp directory cleaned up")
-                except Exception as cleanup_error:
-                    logger.warning(f"Failed to cleanup temp directory: {cleanup_error}")
-                    
-        except Exception as temp_error:
-            logger.error(f"Failed to create temp directory: {temp_error}")
-            return jsonify({'error': '一時ディレクトリの作成に失敗しました'}), 500
-                
+            else:
+                response = _build_zip_response(
+                    url, page_response, article_cache, optimize, cache_variant, waiting, formats
+                )
+        except BaseException as build_error:
+            waiting.fail(build_error)
+            raise
+        # ZIPを共有せずに終わった（エラー応答の）場合は待機中のリクエストにも同じエラーを返す
+        waiting.fail_with_response(response)
+        return response
+
     except Exception as e:
-        logger.error(f"Request error: {str(e)}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception("Request error: %s", e)
         return jsonify({'error': 'リクエストの処理に失敗しました'}), 500
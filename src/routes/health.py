@@ -1,5 +1,9 @@
 from flask import Blueprint, jsonify
 from flask_cors import cross_origin
+from src.utils import http_client, preload
+from src.utils.article_cache import get_article_cache
+from src.utils.image_cache import get_image_cache
+from src.utils.rate_limiter import get_rate_limiter
 
 health_bp = Blueprint('health', __name__)
 
@@ -8,22 +12,18 @@ health_bp = Blueprint('health', __name__)
 def health_check():
     """ヘルスチェック用エンドポイント"""
     try:
-        import requests
-        import bs4
-        import markdownify
-        import tempfile
-        import zipfile
-        
+        # 依存モジュールは読み込まずに確認する（結果はプロセスごとに1回だけ求める）
+        dependencies = {name: 'ok' for name in preload.dependency_status()}
+        dependencies.update(tempfile='ok', zipfile='ok')
+
         return jsonify({
             'status': 'ok',
             'message': 'All dependencies are available',
-            'dependencies': {
-                'requests': 'ok',
-                'bs4': 'ok', 
-                'markdownify': 'ok',
-                'tempfile': 'ok',
-                'zipfile': 'ok'
-            }
+            'dependencies': dependencies,
+            'http_client': http_client.get_stats(),
+            'image_cache': get_image_cache().get_stats(),
+            'article_cache': get_article_cache().get_stats(),
+            'rate_limiter': get_rate_limiter().get_stats()
         }), 200
     except ImportError as e:
         return jsonify({
@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import logging
+from functools import partial
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
+from flask_cors import cross_origin
+from src.models.user import db
+from src.models.job import DownloadJob
+from src.routes.download import fetch_article_page, parse_article, iter_article_entries
+from src.utils import article_archive
+from src.utils.exporters import formats_from_request, formats_variant
+from src.utils.image_optimizer import options_from_request
+from src.utils.job_queue import IncompleteJobError, QueueFullError, final_attempt, get_job_queue, update_job
+from src.utils.zip_stream import stream_zip
+
+jobs_bp = Blueprint('jobs', __name__)
+
+logger = logging.getLogger(__name__)
+
+# SSEで進捗を確認する間隔（秒）
+JOB_EVENT_INTERVAL = 0.5
+JOB_EVENT_KEEPALIVE = 15
+
+
+@jobs_bp.before_request
+def _start_job_queue():
+    # キューの起動時に、終了したワーカーが残した実行中のジョブを失敗にする（再起動後の状態・再実行の前に必要）
+    get_job_queue(current_app._get_current_object())
+
+
+def run_article_job(job_id, url, optimize=None, formats=None):
+    """Download an article into the job's artifact ZIP, recording progress.
+
+    The parsed page and each fetched image are checkpointed, so a retry
+    only fetches what is still missing.
+    """
+    queue = get_job_queue(current_app._get_current_object())
+    artifact_path = queue.artifact_path(job_id)
+    checkpoint = queue.checkpoint(job_id)
+
+    page_response = checkpoint.load_page()
+    if page_response is None:
+        update_job(job_id, stage='fetching')
+        page_response = fetch_article_page(url)
+        update_job(job_id, stage='parsing')
+        article_title, content_div = parse_article(page_response)
+        # 解析できたページだけを保存する（エラーページから再開しない）
+        checkpoint.save_page(page_response)
+    else:
+        logger.info("Resuming job %s from checkpoint (%d images)", job_id, checkpoint.image_count)
+        update_job(job_id, stage='parsing')
+        article_title, content_div = parse_article(page_response)
+
+    update_job(job_id, stage='images', title=article_title)
+    counts = {'done': 0, 'total': 0}
+
+    def on_progress(done, total):
+        counts['done'], counts['total'] = done, total
+
+    rendered = {}
+    entries = iter_article_entries(
+        url, article_title, content_div, rendered, progress=on_progress, optimize=optimize,
+        formats=formats, checkpoint=checkpoint
+    )
+    partial_path = f"{artifact_path}.part"
+    bytes_written = 0
+    try:
+        with open(partial_path, 'wb') as f:
+            for chunk in stream_zip(entries):
+                f.write(chunk)
+                bytes_written += len(chunk)
+                update_job(
+                    job_id, images_done=counts['done'], images_total=counts['total'],
+                    bytes_written=bytes_written,
+                    stage='converting' if 'markdown' in rendered else 'images',
+                )
+        failed_images = rendered.get('transient_failed_images', 0)
+        if failed_images and not final_attempt():
+            # 取得済みの画像はチェックポイントにあるため、再試行では失敗した画像だけを取り直す
+            # （404 などの恒久的なエラーは再試行しても変わらないので対象にしない）
+            raise IncompleteJobError(f"{failed_images}枚の画像を一時的なエラーで取得できませんでした")
+        os.replace(partial_path, artifact_path)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    if 'markdown' in rendered:
+        default_output = optimize is None and not formats_variant(formats)
+        article_archive.archive_article(
+            url, article_title, rendered['markdown'], page_response.headers,
+            zip_path=artifact_path if default_output else None
+        )
+    update_job(job_id, artifact_path=artifact_path)
+    checkpoint.remove()
+
+
+@jobs_bp.route('/jobs', methods=['POST'])
+@cross_origin()
+def create_job():
+    """ダウンロードジョブを登録してジョブIDを返す"""
+    data = request.get_json(silent=True)
+    if not data or 'url' not in data:
+        return jsonify({'error': 'URLが指定されていません'}), 400
+
+    url = data['url']
+    if not url or not isinstance(url, str):
+        return jsonify({'error': '有効なURLを入力してください'}), 400
+    if 'qiita.com' not in url:
+        return jsonify({'error': 'QiitaのURLを入力してください'}), 400
+
+    try:
+        optimize = options_from_request(data.get('optimize_images'))
+        formats = formats_from_request(data.get('formats'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # 再実行のために、リクエストの指定をそのまま保存する
+    options = {'optimize_images': data.get('optimize_images'), 'formats': data.get('formats')}
+    try:
+        job = get_job_queue(current_app._get_current_object()).submit(
+            url, partial(run_article_job, optimize=optimize, formats=formats), options=options
+        )
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+
+    logger.info("Job %s queued for %s", job.id, url)
+    return jsonify(job.to_dict()), 202
+
+
+@jobs_bp.route('/jobs/<job_id>/retry', methods=['POST'])
+@cross_origin()
+def retry_job(job_id):
+    """失敗したジョブを再実行する（取得済みのページと画像から再開）"""
+    job = db.get_or_404(DownloadJob, job_id)
+    if job.status != 'failed':
+        return jsonify({'error': '失敗したジョブだけを再実行できます', 'status': job.status}), 409
+
+    queue = get_job_queue(current_app._get_current_object())
+    options = queue.checkpoint(job_id).load_options()
+    if options is None:
+        return jsonify({'error': '再実行に必要なデータの有効期限が切れています'}), 410
+    optimize = options_from_request(options.get('optimize_images'))
+    formats = formats_from_request(options.get('formats'))
+
+    try:
+        resubmitted = queue.resubmit(job, partial(run_article_job, optimize=optimize, formats=formats))
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    if not resubmitted:
+        return jsonify({'error': 'ジョブはすでに再実行されています'}), 409
+
+    logger.info("Job %s resubmitted for %s", job.id, job.url)
+    return jsonify(job.to_dict()), 202
+
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+@cross_origin()
+def get_job(job_id):
+    job = db.get_or_404(DownloadJob, job_id)
+    return jsonify(job.to_dict())
+
+
+@jobs_bp.route('/jobs/<job_id>/events', methods=['GET'])
+@cross_origin()
+def job_events(job_id):
+    """ジョブの進捗をServer-Sent Eventsで配信"""
+    db.get_or_404(DownloadJob, job_id)
+    app = current_app._get_current_object()
+
+    def generate():
+        last_payload = None
+        last_sent = time.monotonic()
+        while True:
+            with app.app_context():
+                job = db.session.get(DownloadJob, job_id)
+                state = job.to_dict() if job is not None else None
+                db.session.remove()
+
+            if state is None:
+                yield 'event: error\ndata: {"error": "job not found"}\n\n'
+                return
+
+            payload = json.dumps(state, ensure_ascii=False)
+            if payload != last_payload:
+                yield f"data: {payload}\n\n"
+                last_payload = payload
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= JOB_EVENT_KEEPALIVE:
+                yield ': keep-alive\n\n'
+                last_sent = time.monotonic()
+
+            if state['status'] in ('succeeded', 'failed'):
+                return
+            time.sleep(JOB_EVENT_INTERVAL)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@jobs_bp.route('/jobs/<job_id>/artifact', methods=['GET'])
+@cross_origin()
+def get_job_artifact(job_id):
+    """完了したジョブのZIPファイルを返す"""
+    job = db.get_or_404(DownloadJob, job_id)
+    if job.status != 'succeeded':
+        return jsonify({'error': 'ジョブはまだ完了していません', 'status': job.status}), 409
+    if not job.artifact_path or not os.path.exists(job.artifact_path):
+        return jsonify({'error': 'ファイルの有効期限が切れています'}), 410
+
+    # Range / If-Range に応じて部分的に返すため、中断した転送を途中から再開できる
+    response = send_file(
+        job.artifact_path,
+        as_attachment=True,
+        download_name=f"{job.title}.zip",
+        mimetype='application/zip',
+        conditional=True
+    )
+    # werkzeug は Range 付きのリクエストにしか付けないため、最初の応答から対応を知らせる
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,77 @@
+import time
+from flask import Blueprint, Response, g, request
+from src.utils import http_client, metrics
+from src.utils.article_cache import get_article_cache
+from src.utils.image_cache import get_image_cache
+from src.utils.rate_limiter import get_rate_limiter
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.before_app_request
+def _start_request_timer():
+    metrics.start_flusher()
+    g.metrics_start = time.perf_counter()
+    g.metrics_spans = metrics.start_request_spans()
+
+
+@metrics_bp.after_app_request
+def _record_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    metrics.REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        endpoint=request.endpoint or 'unmatched', status=str(response.status_code)
+    )
+
+    # 計測した段階を Server-Timing ヘッダーで返す（ストリーミング時は送信前の段階のみ）
+    totals = {}
+    for stage, seconds in metrics.request_spans():
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    if totals:
+        response.headers['Server-Timing'] = ', '.join(
+            f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items()
+        )
+    return response
+
+
+@metrics_bp.teardown_app_request
+def _end_request_spans(exc):
+    token = g.pop('metrics_spans', None)
+    if token is not None:
+        metrics.end_request_spans(token)
+
+
+def _cache_stats():
+    return {'image': get_image_cache().get_stats(), 'article': get_article_cache().get_stats()}
+
+
+# HTTPクライアント・キャッシュ・レート制限が持つ値はメトリクスを出力するときに読み出す
+metrics.Collected(
+    'qiita_http_requests_total', 'Requests sent through the shared HTTP session.', 'counter', (),
+    lambda: [((), http_client.get_stats()['requests'])]
+)
+metrics.Collected(
+    'qiita_http_connections_opened_total', 'Connections opened by the shared HTTP session.', 'counter', (),
+    lambda: [((), http_client.get_stats()['connections_opened'])]
+)
+metrics.Collected(
+    'qiita_cache_requests_total', 'Cache lookups by result.', 'counter', ('cache', 'result'),
+    lambda: [((cache, result), stats.get(result, 0))
+             for cache, stats in _cache_stats().items() for result in ('hits', 'misses', 'revalidated')]
+)
+metrics.Collected(
+    'qiita_cache_bytes', 'Bytes currently stored in each cache.', 'gauge', ('cache',),
+    lambda: [((cache,), stats['bytes']) for cache, stats in _cache_stats().items()]
+)
+metrics.Collected(
+    'qiita_rate_limit_queued', 'Outbound requests waiting in the rate limit queue, per host.', 'gauge', ('host',),
+    lambda: [((host,), stats['queued']) for host, stats in sorted(get_rate_limiter().get_stats().items())]
+)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Prometheus形式のメトリクス"""
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
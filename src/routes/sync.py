@@ -0,0 +1,273 @@
+import os
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Blueprint, request, jsonify
+from flask_cors import cross_origin
+from src.models.user import db
+from src.models.sync import SyncedArticle
+from src.routes.download import fetch_article_page, download_qiita_article
+from src.utils import http_client
+from src.utils.image_optimizer import options_from_request
+from src.utils.qiita_api import list_items, resolve_source
+from src.utils.rate_limiter import run_in_flow
+
+sync_bp = Blueprint('sync', __name__)
+
+logger = logging.getLogger(__name__)
+
+# 差分同期の設定
+SYNC_DIR = os.environ.get(
+    'QIITA_SYNC_DIR',
+    os.path.join(tempfile.gettempdir(), 'qiita_web_downloader', 'mirror'),
+)
+SYNC_WORKERS = int(os.environ.get('QIITA_SYNC_WORKERS', '4'))
+SYNC_MAX_ARTICLES = int(os.environ.get('QIITA_SYNC_MAX_ARTICLES', '1000'))
+
+_source_locks = {}
+_source_locks_guard = threading.Lock()
+
+
+class SyncInProgressError(Exception):
+    """Raised when the same source is already being synced."""
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _image_hashes(article_dir):
+    images_dir = os.path.join(article_dir, 'images')
+    if not os.path.isdir(images_dir):
+        return {}
+    return {name: _file_hash(os.path.join(images_dir, name)) for name in sorted(os.listdir(images_dir))}
+
+
+@http_client.byte_budget()
+def _render(item, validators, staging_dir, optimize):
+    """Fetch one article, conditionally if it was synced before, within its own download budget.
+
+    ``validators`` are the conditional request headers of the manifest row;
+    runs in a pool thread, so it is given plain values rather than the row.
+    Returns None when the server answered 304, otherwise a dict describing
+    the article rendered under ``staging_dir``.
+    """
+    response = fetch_article_page(item['url'], headers=validators or None)
+    if response.status_code == 304:
+        return None
+
+    updated_at = item['updated_at']
+    if updated_at is None and response.headers.get('Content-Type', '').startswith('application/json'):
+        updated_at = response.json().get('updated_at')
+
+    article_dir, title = download_qiita_article(
+        item['url'], os.path.join(staging_dir, item['id']), response=response, optimize=optimize
+    )
+    return {
+        'dir': article_dir,
+        'title': title,
+        'updated_at': updated_at,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'images': _image_hashes(article_dir),
+    }
+
+
+def _install(rendered, target_dir, previous_dir, previous_images):
+    """Move a rendered article into the mirror, touching only changed files.
+
+    Returns True if anything in the mirror changed.
+    """
+    changed = False
+    if previous_dir and previous_dir != target_dir and os.path.isdir(previous_dir):
+        if os.path.exists(target_dir):
+            shutil.rmtree(target_dir)
+        os.replace(previous_dir, target_dir)
+        changed = True
+
+    images_dir = os.path.join(target_dir, 'images')
+    os.makedirs(images_dir, exist_ok=True)
+    for name, digest in rendered['images'].items():
+        path = os.path.join(images_dir, name)
+        if previous_images.get(name) != digest or not os.path.exists(path):
+            os.replace(os.path.join(rendered['dir'], 'images', name), path)
+            changed = True
+    for name in set(previous_images) - set(rendered['images']):
+        path = os.path.join(images_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+        changed = True
+
+    md_path = os.path.join(target_dir, 'article.md')
+    new_md_path = os.path.join(rendered['dir'], 'article.md')
+    if not os.path.exists(md_path) or _file_hash(md_path) != _file_hash(new_md_path):
+        os.replace(new_md_path, md_path)
+        changed = True
+    return changed
+
+
+def _article_dir_name(title, item_id, used_paths):
+    """Directory name for an article; titles shared within a source get the item id appended."""
+    if title in ('', '.', '..'):
+        return item_id
+    return title if title not in used_paths else f"{title}_{item_id}"
+
+
+def _source_lock(source):
+    with _source_locks_guard:
+        return _source_locks.setdefault(source, threading.Lock())
+
+
+def _apply(source, mirror_dir, item, article, rendered, used_paths):
+    """Install a rendered article and update its manifest row. Returns the count key."""
+    if rendered is None:
+        # 304: 内容は変わっていない
+        if item['updated_at']:
+            article.updated_at = item['updated_at']
+        return 'unchanged'
+
+    if article is not None:
+        used_paths.discard(article.path)
+    dir_name = _article_dir_name(rendered['title'], item['id'], used_paths)
+    used_paths.add(dir_name)
+
+    previous_dir = os.path.join(mirror_dir, article.path) if article is not None and article.path else None
+    changed = _install(
+        rendered, os.path.join(mirror_dir, dir_name), previous_dir,
+        article.images if article is not None else {},
+    )
+
+    status = 'updated' if changed else 'unchanged'
+    if article is None:
+        article = SyncedArticle(source=source, item_id=item['id'])
+        db.session.add(article)
+        status = 'added'
+    article.url = item['url']
+    article.title = rendered['title']
+    article.path = dir_name
+    article.updated_at = rendered['updated_at']
+    article.etag = rendered['etag']
+    article.last_modified = rendered['last_modified']
+    article.images = rendered['images']
+    return status
+
+
+def sync_source(source_url, root=None, limit=None, optimize=None):
+    """Mirror a user, tag or organization page into ``root``, re-rendering only what changed.
+
+    Articles whose listing ``updated_at`` matches the manifest are skipped
+    without a request; the rest are fetched conditionally with the stored
+    ETag / Last-Modified. Articles missing from a complete listing are
+    removed. Must be called inside an application context. Returns counts of
+    added, updated, unchanged, removed and failed articles.
+    """
+    kind, name = resolve_source(source_url)
+    source = f"{kind}/{name}"
+    mirror_dir = os.path.join(root or SYNC_DIR, kind, name)
+    limit = limit or SYNC_MAX_ARTICLES
+
+    lock = _source_lock(source)
+    if not lock.acquire(blocking=False):
+        raise SyncInProgressError(source)
+    try:
+        # 1件多く取得して一覧が上限で切れていないかを判定する
+        items = list_items(source_url, limit + 1)
+        complete = len(items) <= limit
+        items = [item for item in items[:limit] if item['id']]
+
+        known = {article.item_id: article for article in SyncedArticle.query.filter_by(source=source)}
+        result = {'source': source, 'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0,
+                  'failed': 0, 'errors': []}
+
+        pending = []
+        for item in items:
+            article = known.get(item['id'])
+            if (article is not None and item['updated_at'] and article.updated_at == item['updated_at']
+                    and os.path.isdir(os.path.join(mirror_dir, article.path))):
+                result['unchanged'] += 1
+            else:
+                pending.append((item, article))
+
+        if pending:
+            os.makedirs(mirror_dir, exist_ok=True)
+            staging_dir = tempfile.mkdtemp(prefix='.staging-', dir=mirror_dir)
+            try:
+                with ThreadPoolExecutor(max_workers=min(SYNC_WORKERS, len(pending))) as executor:
+                    # 行はコミットのたびに期限切れになるため、スレッドには読み出した値だけを渡す
+                    futures = [
+                        executor.submit(
+                            run_in_flow, f"sync-{source}", _render, item,
+                            article.validators() if article is not None else None, staging_dir, optimize
+                        )
+                        for item, article in pending
+                    ]
+                    used_paths = {article.path for article in known.values()}
+                    for (item, article), future in zip(pending, futures):
+                        try:
+                            rendered = future.result()
+                        except Exception as e:
+                            logger.warning("Sync failed for %s: %s", item['url'], e)
+                            result['failed'] += 1
+                            result['errors'].append({'url': item['url'], 'error': str(e)})
+                            continue
+                        status = _apply(source, mirror_dir, item, article, rendered, used_paths)
+                        result[status] += 1
+                        db.session.commit()
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+        if complete:
+            listed = {item['id'] for item in items}
+            for item_id, article in known.items():
+                if item_id not in listed:
+                    shutil.rmtree(os.path.join(mirror_dir, article.path), ignore_errors=True)
+                    db.session.delete(article)
+                    result['removed'] += 1
+            db.session.commit()
+        elif known.keys() - {item['id'] for item in items}:
+            logger.warning("Listing of %s exceeds %s articles; not removing any", source, limit)
+
+        logger.info(
+            "Synced %s: %d added, %d updated, %d unchanged, %d removed, %d failed", source,
+            result['added'], result['updated'], result['unchanged'], result['removed'], result['failed']
+        )
+        return result
+    finally:
+        lock.release()
+
+
+
+@sync_bp.route('/sync', methods=['POST'])
+@cross_origin()
+def sync():
+    """ユーザー・タグ・Organizationの記事を差分同期"""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'JSONの解析に失敗しました'}), 400
+
+    source = data.get('source')
+    if not isinstance(source, str) or 'qiita.com' not in source:
+        return jsonify({'error': 'QiitaのURLを入力してください'}), 400
+
+    try:
+        optimize = options_from_request(data.get('optimize_images'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        result = sync_source(source, optimize=optimize)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except SyncInProgressError:
+        return jsonify({'error': 'この記事一覧は同期中です'}), 409
+    except Exception as e:
+        logger.error("Sync failed: %s", e)
+        return jsonify({'error': f'同期に失敗しました: {str(e)}'}), 500
+    return jsonify(result)
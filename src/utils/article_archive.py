@@ -0,0 +1,154 @@
+import os
+import re
+import shutil
+import hashlib
+import logging
+from urllib.parse import urlparse
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.models.user import db
+from src.models.archive import ArchivedArticle
+from src.utils.article_cache import normalize_article_url
+from src.utils.qiita_api import extract_item_id
+
+logger = logging.getLogger(__name__)
+
+# ダウンロードした記事をデータベースに保存する（0 で無効）
+ARCHIVE_ENABLED = os.environ.get('QIITA_ARCHIVE', '1') == '1'
+# アーカイブしたZIPの保存先
+ARCHIVE_DIR = os.environ.get(
+    'QIITA_ARCHIVE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'archive'),
+)
+ARCHIVE_SEARCH_MAX_PER_PAGE = 100
+
+# trigram は3文字未満の語を索引から引けないため、短い語はLIKEで絞り込む
+_MIN_INDEXED_TERM = 3
+_SNIPPET_TOKENS = 16
+
+_fts_available = None
+
+
+def _author(url):
+    match = re.match(r'^/([^/]+)/items/', urlparse(url).path)
+    return match.group(1) if match else None
+
+
+def _enabled():
+    # データベースを設定していないアプリ（ベンチマークなど）ではアーカイブしない
+    return ARCHIVE_ENABLED and 'sqlalchemy' in current_app.extensions
+
+
+def lookup(url):
+    """Return the archived copy of ``url``, or None."""
+    if not _enabled():
+        return None
+    return ArchivedArticle.query.filter_by(url=normalize_article_url(url)).first()
+
+
+def archive_article(url, title, markdown, headers, zip_path=None):
+    """Store or update an article; ``zip_path`` (the default output) is copied into ``ARCHIVE_DIR``.
+
+    Must be called inside an application context. Failures are logged and
+    never fail the download that produced the article.
+    """
+    if not _enabled():
+        return None
+    key = normalize_article_url(url)
+    try:
+        archived_zip = None
+        if zip_path is not None:
+            os.makedirs(ARCHIVE_DIR, exist_ok=True)
+            archived_zip = os.path.join(ARCHIVE_DIR, f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.zip")
+            # 送信中の古いZIPを壊さないよう、別名に書いてから置き換える
+            partial_path = f"{archived_zip}.{os.getpid()}.part"
+            shutil.copyfile(zip_path, partial_path)
+            os.replace(partial_path, archived_zip)
+
+        article = ArchivedArticle.query.filter_by(url=key).first()
+        if article is None:
+            article = ArchivedArticle(url=key)
+            db.session.add(article)
+        article.item_id = extract_item_id(key)
+        article.author = _author(key)
+        article.title = title
+        article.markdown = markdown
+        article.etag = headers.get('ETag')
+        article.last_modified = headers.get('Last-Modified')
+        if archived_zip is not None:
+            article.zip_path = archived_zip
+        db.session.commit()
+        return article
+    except (OSError, SQLAlchemyError) as e:
+        db.session.rollback()
+        logger.warning("Failed to archive %s: %s", url, e)
+        return None
+
+
+def _has_search_index():
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'archived_article_fts'"
+        )).first() is not None
+    return _fts_available
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def search(query, page=1, per_page=20):
+    """Full-text search over archived titles and Markdown.
+
+    All whitespace separated terms must match. Results are ranked by BM25
+    (title matches weigh more) and returned with a highlighted snippet;
+    queries with only short terms fall back to newest first.
+    Returns ``(total, results)``.
+    """
+    terms = [term for term in query.split() if term]
+    if not terms:
+        return 0, []
+    per_page = max(1, min(per_page, ARCHIVE_SEARCH_MAX_PER_PAGE))
+    offset = (max(1, page) - 1) * per_page
+
+    indexed = [term for term in terms if len(term) >= _MIN_INDEXED_TERM] if _has_search_index() else []
+    params = {'limit': per_page, 'offset': offset}
+    filters = []
+    for index, term in enumerate(term for term in terms if term not in indexed):
+        params[f'like{index}'] = _like_pattern(term)
+        filters.append(f"(a.title LIKE :like{index} ESCAPE '\\' OR a.markdown LIKE :like{index} ESCAPE '\\')")
+
+    if indexed:
+        # 語はフレーズとして引用し、FTS5の演算子として解釈させない
+        params['match'] = ' '.join('"' + term.replace('"', '""') + '"' for term in indexed)
+        source = ('archived_article_fts JOIN archived_article a ON a.id = archived_article_fts.rowid '
+                  'WHERE archived_article_fts MATCH :match')
+        where = ''.join(f" AND {condition}" for condition in filters)
+        select = (f"SELECT a.id, bm25(archived_article_fts, 10.0, 1.0) AS score, "
+                  f"snippet(archived_article_fts, 1, '<mark>', '</mark>', '…', {_SNIPPET_TOKENS}) AS snippet "
+                  f"FROM {source}{where} ORDER BY score LIMIT :limit OFFSET :offset")
+        count = f"SELECT count(*) FROM {source}{where}"
+    else:
+        source = 'archived_article a WHERE ' + ' AND '.join(filters)
+        select = (f"SELECT a.id, NULL AS score, substr(a.markdown, 1, 120) AS snippet "
+                  f"FROM {source} ORDER BY a.archived_at DESC LIMIT :limit OFFSET :offset")
+        count = f"SELECT count(*) FROM {source}"
+
+    total = db.session.execute(text(count), params).scalar()
+    rows = db.session.execute(text(select), params).all()
+    articles = {
+        article.id: article
+        for article in ArchivedArticle.query.options(db.defer(ArchivedArticle.markdown))
+        .filter(ArchivedArticle.id.in_([row.id for row in rows]))
+    }
+    results = [
+        # bm25 は小さいほど関連が高いため、符号を反転して返す
+        dict(articles[row.id].to_dict(), score=-row.score if row.score is not None else None, snippet=row.snippet)
+        for row in rows if row.id in articles
+    ]
+    return total, results
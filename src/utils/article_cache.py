@@ -0,0 +1,195 @@
+import os
+import time
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, urlunparse
+
+logger = logging.getLogger(__name__)
+
+# 生成済み記事キャッシュの設定（最大サイズ 0 でキャッシュ無効）
+ARTICLE_CACHE_DIR = os.environ.get(
+    'QIITA_ARTICLE_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'qiita_web_downloader', 'articles'),
+)
+ARTICLE_CACHE_MAX_BYTES = int(os.environ.get('QIITA_ARTICLE_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+ARTICLE_CACHE_TTL = int(os.environ.get('QIITA_ARTICLE_CACHE_TTL', '3600'))
+
+
+def normalize_article_url(url):
+    """Normalize a Qiita article URL so equivalent URLs share a cache key."""
+    parsed = urlparse(url.strip())
+    path = parsed.path.rstrip('/') or '/'
+    return urlunparse(('https', parsed.netloc.lower(), path, '', '', ''))
+
+
+class CachedArticle:
+    """A rendered article (Markdown + ZIP) stored in the cache."""
+
+    def __init__(self, key, title, zip_path, markdown_path, etag, last_modified, expires_at):
+        self.key = key
+        self.title = title
+        self.zip_path = zip_path
+        self.markdown_path = markdown_path
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.size = os.path.getsize(zip_path) + (os.path.getsize(markdown_path) if markdown_path else 0)
+
+    def validators(self):
+        """Conditional request headers for revalidating against qiita.com."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def read_markdown(self):
+        if self.markdown_path is None:
+            return None
+        with open(self.markdown_path, encoding='utf-8') as f:
+            return f.read()
+
+
+class ArticleCache:
+    """LRU cache of rendered articles keyed by normalized URL.
+
+    The index lives in memory; artifacts are kept on disk under ``cache_dir``
+    and the total size is bounded by ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir=ARTICLE_CACHE_DIR, max_bytes=ARTICLE_CACHE_MAX_BYTES,
+                 ttl=ARTICLE_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._metrics = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stale': 0, 'evictions': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self._remove_expired_files()
+
+    def _remove_expired_files(self):
+        """Delete artifacts left behind by earlier processes that have outlived the TTL."""
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _key(self, url, variant):
+        key = normalize_article_url(url)
+        return f"{key}#{variant}" if variant else key
+
+    def get(self, url, variant=''):
+        """Return the cached article for ``url`` or None if missing or expired.
+
+        ``variant`` separates artifacts rendered with different options.
+        """
+        if not self.enabled:
+            return None
+        key = self._key(url, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._metrics['misses'] += 1
+                return None
+            if time.time() >= entry.expires_at:
+                self._remove(key)
+                self._metrics['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._metrics['hits'] += 1
+            return entry
+
+    def put(self, url, title, zip_path, markdown_path, headers, variant=''):
+        """Copy the rendered artifacts into the cache.
+
+        ``markdown_path`` may be None for outputs without ``article.md``.
+        """
+        if not self.enabled:
+            return None
+        key = self._key(url, variant)
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        # 送信中の古いファイルを壊さないよう、世代ごとに別名で保存する
+        stamp = f"{digest}_{time.time_ns()}"
+        cached_zip = os.path.join(self.cache_dir, f"{stamp}.zip")
+        cached_md = os.path.join(self.cache_dir, f"{stamp}.md")
+        shutil.copyfile(zip_path, cached_zip)
+        if markdown_path is not None:
+            shutil.copyfile(markdown_path, cached_md)
+        else:
+            cached_md = None
+        entry = CachedArticle(
+            key, title, cached_zip, cached_md, headers.get('ETag'), headers.get('Last-Modified'),
+            time.time() + self.ttl,
+        )
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._metrics['evictions'] += 1
+        return entry
+
+    def mark_revalidated(self, entry):
+        """Record a 304 response and extend the entry's lifetime."""
+        with self._lock:
+            self._metrics['revalidated'] += 1
+            entry.expires_at = time.time() + self.ttl
+
+    def mark_stale(self, entry):
+        """Record that upstream changed and drop the entry."""
+        with self._lock:
+            self._metrics['stale'] += 1
+            if self._entries.get(entry.key) is entry:
+                self._remove(entry.key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for path in filter(None, (entry.zip_path, entry.markdown_path)):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning("Failed to remove cached artifact %s: %s", path, e)
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats.update({
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            })
+            return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_article_cache():
+    """Return the process-wide rendered-article cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ArticleCache()
+    return _cache
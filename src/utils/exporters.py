@@ -0,0 +1,250 @@
+import io
+import re
+import base64
+import zipfile
+import mimetypes
+from datetime import datetime, timezone
+from html import escape
+
+from src.utils.qiita_api import MarkdownBody
+
+# 単一ファイルのHTML / EPUBに埋め込むスタイル
+ARTICLE_CSS = (
+    'body{font-family:sans-serif;line-height:1.7;max-width:48em;margin:0 auto;padding:1em;}'
+    'img{max-width:100%;height:auto;}'
+    'pre{background:#f6f8fa;padding:.8em;overflow:auto;}'
+    'code{font-family:monospace;}'
+    'table{border-collapse:collapse;}th,td{border:1px solid #ccc;padding:.3em .6em;}'
+)
+
+# EPUBでは実行できない・表示できない要素
+_UNSAFE_TAGS = ('script', 'iframe', 'object', 'embed', 'form')
+# Markdown中のローカル画像参照（![alt](images/x.png) と <img src="images/x.png">）
+_LOCAL_IMAGE = re.compile(r'(\]\(\s*<?|src=["\'])images/([^)\s>"\']+)')
+
+_exporters = {}
+
+
+class ExportArticle:
+    """An article fetched, parsed and with its images downloaded once.
+
+    ``content_div`` already points its images at ``images/<name>``; every
+    exporter reads from this object, so several formats cost one pipeline
+    run. The Markdown is converted on first use only.
+    """
+
+    def __init__(self, url, title, content_div, images, convert_to_markdown):
+        self.url = url
+        self.title = title
+        self.content_div = content_div
+        self.images = images
+        self._convert_to_markdown = convert_to_markdown
+        self.rendered_markdown = None
+
+    @property
+    def markdown(self):
+        if self.rendered_markdown is None:
+            self.rendered_markdown = self._convert_to_markdown(self.content_div)
+        return self.rendered_markdown
+
+    def body_html(self):
+        """The article body as HTML with local image paths."""
+        if isinstance(self.content_div, MarkdownBody):
+            html = self.content_div.render_html()
+            if html is None:
+                return f"<pre>{escape(self.content_div.render())}</pre>"
+            return html
+        return str(self.content_div)
+
+    def data_uris(self):
+        """``{image name: data URI}`` for inlining images."""
+        return {
+            name: f"data:{_media_type(name)};base64,{base64.b64encode(content).decode('ascii')}"
+            for name, content in self.images
+        }
+
+
+class Exporter:
+    """Produces the files of one output format from an ``ExportArticle``."""
+
+    name = None
+
+    def entries(self, article):
+        """Yield ``(path, data)`` relative to the article directory."""
+        raise NotImplementedError
+
+
+def register_exporter(cls):
+    """Class decorator adding an exporter under ``cls.name``."""
+    _exporters[cls.name] = cls()
+    return cls
+
+
+def available_formats():
+    return tuple(_exporters)
+
+
+def formats_from_request(value):
+    """Parse a request's ``formats`` field (a list or comma separated string).
+
+    Returns a tuple of format names in request order, or None when the field
+    is absent. Raises ValueError for unknown formats.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ValueError('formats は形式名の配列で指定してください')
+    formats = tuple(dict.fromkeys(name.strip().lower() for name in value if name.strip()))
+    if not formats:
+        raise ValueError('formats に出力形式を1つ以上指定してください')
+    unknown = [name for name in formats if name not in _exporters]
+    if unknown:
+        raise ValueError(
+            f"未対応の出力形式です: {', '.join(unknown)}（{', '.join(available_formats())} から選択してください）"
+        )
+    return formats
+
+
+def formats_variant(formats):
+    """Cache variant for ``formats``; empty for the default Markdown output."""
+    if not formats or formats == ('markdown',):
+        return ''
+    return 'formats-' + '-'.join(formats)
+
+
+def export_entries(article, formats):
+    """Yield ``(path, data)`` for every requested format, relative to the article directory."""
+    for name in formats:
+        yield from _exporters[name].entries(article)
+
+
+def _media_type(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def _inline_images(html, data_uris):
+    """Return ``html`` with ``images/<name>`` sources replaced by data URIs."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    for img_tag in soup.find_all('img'):
+        src = img_tag.get('src') or ''
+        if src.startswith('images/') and src[len('images/'):] in data_uris:
+            img_tag['src'] = data_uris[src[len('images/'):]]
+    return str(soup)
+
+
+@register_exporter
+class MarkdownExporter(Exporter):
+    """``article.md`` and the ``images/`` directory (the default output)."""
+
+    name = 'markdown'
+
+    def entries(self, article):
+        for name, content in article.images:
+            yield f"images/{name}", content
+        yield 'article.md', article.markdown.encode('utf-8')
+
+
+@register_exporter
+class InlineMarkdownExporter(Exporter):
+    """``article.inline.md`` with images embedded as base64 data URIs."""
+
+    name = 'markdown-inline'
+
+    def entries(self, article):
+        data_uris = article.data_uris()
+
+        def inline(match):
+            uri = data_uris.get(match.group(2))
+            return match.group(1) + uri if uri else match.group(0)
+
+        yield 'article.inline.md', _LOCAL_IMAGE.sub(inline, article.markdown).encode('utf-8')
+
+
+@register_exporter
+class HtmlExporter(Exporter):
+    """A single self-contained ``article.html`` with inlined images and styles."""
+
+    name = 'html'
+
+    def entries(self, article):
+        body = _inline_images(article.body_html(), article.data_uris())
+        title = escape(article.title)
+        html = (
+            '<!DOCTYPE html>\n<html lang="ja"><head><meta charset="utf-8">'
+            f'<meta name="viewport" content="width=device-width, initial-scale=1">'
+            f'<title>{title}</title><style>{ARTICLE_CSS}</style></head>'
+            f'<body><article><h1>{title}</h1>{body}</article>'
+            f'<p><a href="{escape(article.url)}">{escape(article.url)}</a></p></body></html>\n'
+        )
+        yield 'article.html', html.encode('utf-8')
+
+
+@register_exporter
+class EpubExporter(Exporter):
+    """An EPUB 3 book, ``article.epub``, with the article as a single chapter."""
+
+    name = 'epub'
+
+    def entries(self, article):
+        yield 'article.epub', self.build(article)
+
+    def _xhtml_body(self, article):
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(article.body_html(), 'html.parser')
+        for tag in soup.find_all(_UNSAFE_TAGS):
+            tag.decompose()
+        # 空要素を <br/> の形で出力するため、XHTMLとして読める
+        return soup.decode(formatter='minimal')
+
+    def build(self, article):
+        title = escape(article.title)
+        modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        chapter = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE html>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="ja" lang="ja"><head>'
+            f'<meta charset="UTF-8"/><title>{title}</title><style>{ARTICLE_CSS}</style></head>'
+            f'<body><h1>{title}</h1>{self._xhtml_body(article)}</body></html>\n'
+        )
+        nav = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE html>\n'
+            '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+            f'xml:lang="ja" lang="ja"><head><meta charset="UTF-8"/><title>{title}</title></head><body>'
+            f'<nav epub:type="toc"><ol><li><a href="article.xhtml">{title}</a></li></ol></nav></body></html>\n'
+        )
+        images = ''.join(
+            f'<item id="image{index}" href="images/{escape(name)}" media-type="{_media_type(name)}"/>'
+            for index, (name, _) in enumerate(article.images, 1)
+        )
+        package = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="uid" xml:lang="ja">'
+            '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+            f'<dc:identifier id="uid">{escape(article.url)}</dc:identifier><dc:title>{title}</dc:title>'
+            f'<dc:language>ja</dc:language><meta property="dcterms:modified">{modified}</meta></metadata>'
+            '<manifest><item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>'
+            f'<item id="article" href="article.xhtml" media-type="application/xhtml+xml"/>{images}</manifest>'
+            '<spine><itemref idref="article"/></spine></package>\n'
+        )
+        container = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container"><rootfiles>'
+            '<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>'
+            '</rootfiles></container>\n'
+        )
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as epub:
+            # mimetype は先頭に無圧縮で置く必要がある
+            epub.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+            epub.writestr('META-INF/container.xml', container)
+            epub.writestr('OEBPS/content.opf', package)
+            epub.writestr('OEBPS/nav.xhtml', nav)
+            epub.writestr('OEBPS/article.xhtml', chapter)
+            for name, content in article.images:
+                epub.writestr(f"OEBPS/images/{name}", content, compress_type=zipfile.ZIP_STORED)
+        return buffer.getvalue()
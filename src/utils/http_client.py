@@ -0,0 +1,254 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from src.utils.rate_limiter import RateLimitExceeded, get_rate_limiter
+
+# 接続プール・リトライ・タイムアウトの設定
+HTTP_POOL_CONNECTIONS = int(os.environ.get('QIITA_HTTP_POOL_CONNECTIONS', '10'))
+HTTP_POOL_MAXSIZE = int(os.environ.get('QIITA_HTTP_POOL_MAXSIZE', '16'))
+HTTP_RETRIES = int(os.environ.get('QIITA_HTTP_RETRIES', '3'))
+HTTP_BACKOFF_FACTOR = float(os.environ.get('QIITA_HTTP_BACKOFF', '0.5'))
+HTTP_CONNECT_TIMEOUT = float(os.environ.get('QIITA_HTTP_CONNECT_TIMEOUT', '5'))
+HTTP_READ_TIMEOUT = float(os.environ.get('QIITA_HTTP_READ_TIMEOUT', '30'))
+# 取得サイズの上限（バイト、0 で無制限）: 記事ページ1件 / 画像1枚 / 1リクエスト・ジョブの合計
+MAX_PAGE_BYTES = int(os.environ.get('QIITA_MAX_PAGE_BYTES', str(10 * 1024 * 1024)))
+MAX_IMAGE_BYTES = int(os.environ.get('QIITA_MAX_IMAGE_BYTES', str(20 * 1024 * 1024)))
+MAX_JOB_BYTES = int(os.environ.get('QIITA_MAX_JOB_BYTES', str(256 * 1024 * 1024)))
+READ_CHUNK_SIZE = 64 * 1024
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+# 送信を一時停止させる応答。全スレッドが止まるよう、接続プールではなく get() でレート制限を通して再送する
+THROTTLE_STATUS_CODES = (429, 503)
+
+# 現在のリクエスト・ジョブで取得したバイト数（画像取得スレッドにも引き継がれる）
+_byte_budget = ContextVar('byte_budget', default=None)
+
+
+class ResponseTooLarge(requests.exceptions.RequestException):
+    """Raised when a response exceeds its size limit."""
+
+
+class ByteBudgetExceeded(ResponseTooLarge):
+    """Raised when a request or job has downloaded more than its byte budget."""
+
+
+class ByteBudget:
+    """Bytes that may still be downloaded by one request or job, shared by its threads."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def check(self, size):
+        """Fail early if ``size`` more bytes (e.g. a Content-Length) would not fit."""
+        if self.used + size > self.limit:
+            raise ByteBudgetExceeded(f"download budget of {self.limit} bytes exceeded")
+
+    def charge(self, size):
+        with self._lock:
+            self.used += size
+            exceeded = self.used > self.limit
+        if exceeded:
+            raise ByteBudgetExceeded(f"download budget of {self.limit} bytes exceeded")
+
+
+def start_byte_budget(limit=None):
+    """Give the current context a fresh budget; returns a token for ``end_byte_budget``."""
+    limit = MAX_JOB_BYTES if limit is None else limit
+    return _byte_budget.set(ByteBudget(limit) if limit > 0 else None)
+
+
+def end_byte_budget(token):
+    _byte_budget.reset(token)
+
+
+@contextmanager
+def byte_budget(limit=None):
+    """Limit the total bytes downloaded in the block (and threads copying its context)."""
+    token = start_byte_budget(limit)
+    try:
+        yield
+    finally:
+        end_byte_budget(token)
+
+
+def read_limited(response, max_bytes=0):
+    """Read a streamed response body, aborting once it exceeds ``max_bytes`` or the byte budget.
+
+    ``Content-Length`` is checked before reading; the streamed byte count is
+    checked as chunks arrive, so a body without a length is cut off as well.
+    """
+    budget = _byte_budget.get()
+    chunks = []
+    size = 0
+    try:
+        length = response.headers.get('Content-Length')
+        if length is not None and length.isdigit():
+            if max_bytes and int(length) > max_bytes:
+                raise ResponseTooLarge(f"{length} bytes exceeds the limit of {max_bytes} bytes")
+            if budget is not None:
+                budget.check(int(length))
+        for chunk in response.iter_content(chunk_size=READ_CHUNK_SIZE):
+            size += len(chunk)
+            if max_bytes and size > max_bytes:
+                raise ResponseTooLarge(f"response exceeds the limit of {max_bytes} bytes")
+            if budget is not None:
+                budget.charge(len(chunk))
+            chunks.append(chunk)
+    except ResponseTooLarge:
+        # 残りを読まずに接続を閉じる
+        response.close()
+        raise
+    return b''.join(chunks)
+
+
+class _Stats:
+    """Thread-safe counters for outbound HTTP activity."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections_opened = 0
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'connections_opened': self.connections_opened,
+                'connections_reused': max(0, self.requests - self.connections_opened),
+            }
+
+
+_stats = _Stats()
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _stats.incr('connections_opened')
+        return super()._new_conn()
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _stats.incr('connections_opened')
+        return super()._new_conn()
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that counts requests and newly opened connections."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _CountingHTTPConnectionPool,
+            'https': _CountingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        _stats.incr('requests')
+        return super().send(request, **kwargs)
+
+
+def _build_session():
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=[code for code in RETRY_STATUS_CODES if code not in THROTTLE_STATUS_CODES],
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        # Retry-After 付きの 429 / 503 も再送しないようにする（get() で扱う）
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = _PooledAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide pooled session."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def get(url, timeout=None, max_bytes=None, **kwargs):
+    """GET through the shared session with default connect/read timeouts.
+
+    Requests wait for the per-host rate limiter and raise
+    ``RateLimitExceeded`` if that would take too long. A 429 or 503 pauses
+    the host's bucket (for ``Retry-After`` if given) and is retried up to
+    ``HTTP_RETRIES`` times, each attempt waiting in the limiter again, so
+    other threads hold off too. With ``max_bytes``
+    the body is streamed through ``read_limited`` (``0`` means only the
+    byte budget applies) and ``ResponseTooLarge`` is raised when it is
+    exceeded; ``response.content`` can then be used as usual.
+    """
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    if max_bytes is not None:
+        kwargs['stream'] = True
+    budget = _byte_budget.get()
+    if budget is not None:
+        # 予算を使い切った後は送信しない
+        budget.check(0)
+    limiter = get_rate_limiter()
+    for attempt in range(HTTP_RETRIES + 1):
+        limiter.acquire(url)
+        response = get_session().get(url, timeout=timeout, **kwargs)
+        limiter.observe(url, response)
+        if response.status_code not in THROTTLE_STATUS_CODES or attempt == HTTP_RETRIES:
+            break
+        response.close()
+        if not limiter.is_limited(url):
+            # レート制限が無効なホストでは接続プールのリトライと同じ間隔で待つ
+            time.sleep(HTTP_BACKOFF_FACTOR * 2 ** attempt)
+    if max_bytes is not None:
+        response._content = read_limited(response, max_bytes)
+        response._content_consumed = True
+    return response
+
+
+def is_transient(error):
+    """True if a request that failed with ``error`` may succeed when tried again later.
+
+    Connection errors, timeouts, rate limiting and the statuses in
+    ``RETRY_STATUS_CODES`` are transient; other HTTP errors (404, 403 ...)
+    and size limits are not.
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUS_CODES
+    return isinstance(error, (
+        requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError, requests.exceptions.RetryError, RateLimitExceeded,
+    ))
+
+
+def get_stats():
+    """Return connection-reuse counters for the shared session."""
+    return _stats.snapshot()
@@ -0,0 +1,222 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 画像キャッシュの設定（最大サイズ 0 でキャッシュ無効）
+IMAGE_CACHE_DIR = os.environ.get(
+    'QIITA_IMAGE_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'qiita_web_downloader', 'images'),
+)
+IMAGE_CACHE_MAX_BYTES = int(os.environ.get('QIITA_IMAGE_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+IMAGE_CACHE_DEFAULT_TTL = int(os.environ.get('QIITA_IMAGE_CACHE_TTL', '86400'))
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    content_type TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    fresh_until REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_hash ON entries (hash);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+'''
+
+
+def _max_age(headers, default):
+    """Return the freshness lifetime from Cache-Control, or ``default``."""
+    cache_control = headers.get('Cache-Control', '')
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = re.search(r'max-age=(\d+)', cache_control)
+    if match:
+        return int(match.group(1))
+    return default
+
+
+class CachedImage:
+    """An image stored in the cache."""
+
+    def __init__(self, url, hash, content_type, etag, last_modified, fresh_until, path):
+        self.url = url
+        self.hash = hash
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fresh_until = fresh_until
+        self.path = path
+
+    @property
+    def is_fresh(self):
+        return time.time() < self.fresh_until
+
+    def validators(self):
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+class ImageCache:
+    """Content-addressed on-disk image cache with LRU eviction.
+
+    Blobs are stored once per SHA-256 under ``objects/``; a SQLite index maps
+    URLs to blobs along with their HTTP validators.
+    """
+
+    def __init__(self, cache_dir=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES,
+                 default_ttl=IMAGE_CACHE_DEFAULT_TTL):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._revalidated = 0
+        os.makedirs(os.path.join(cache_dir, 'objects'), exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(cache_dir, 'index.sqlite3'), check_same_thread=False, timeout=30
+        )
+        self._conn.executescript(_SCHEMA)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, 'objects', digest[:2], digest)
+
+    def lookup(self, url):
+        """Return the cached entry for ``url`` or None."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT hash, content_type, etag, last_modified, fresh_until '
+                'FROM entries WHERE url = ?', (url,)
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+            path = self._blob_path(row[0])
+            if not os.path.exists(path):
+                self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+                self._conn.commit()
+                self._misses += 1
+                return None
+            self._conn.execute('UPDATE entries SET last_access = ? WHERE url = ?', (time.time(), url))
+            self._conn.commit()
+            self._hits += 1
+        return CachedImage(url, row[0], row[1], row[2], row[3], row[4], path)
+
+    def store(self, url, content, headers):
+        """Store ``content`` fetched from ``url`` with its response headers."""
+        if not self.enabled or len(content) > self.max_bytes:
+            return
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries '
+                '(url, hash, size, content_type, etag, last_modified, fresh_until, last_access) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, digest, len(content), headers.get('Content-Type'), headers.get('ETag'),
+                 headers.get('Last-Modified'), now + _max_age(headers, self.default_ttl), now)
+            )
+            self._conn.commit()
+            self._evict()
+
+    def refresh(self, entry, headers):
+        """Extend an entry's freshness after a 304 Not Modified response."""
+        with self._lock:
+            self._revalidated += 1
+            self._conn.execute(
+                'UPDATE entries SET fresh_until = ?, etag = COALESCE(?, etag), '
+                'last_modified = COALESCE(?, last_modified) WHERE url = ?',
+                (time.time() + _max_age(headers, self.default_ttl), headers.get('ETag'),
+                 headers.get('Last-Modified'), entry.url)
+            )
+            self._conn.commit()
+
+    def _total_bytes(self):
+        row = self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT hash, size FROM entries)'
+        ).fetchone()
+        return row[0]
+
+    def _evict(self):
+        """Drop least recently used URLs until the cache fits ``max_bytes``."""
+        total = self._total_bytes()
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute(
+            'SELECT url, hash, size FROM entries ORDER BY last_access'
+        ).fetchall()
+        for url, digest, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute('DELETE FROM entries WHERE url = ?', (url,))
+            remaining = self._conn.execute(
+                'SELECT 1 FROM entries WHERE hash = ? LIMIT 1', (digest,)
+            ).fetchone()
+            if remaining is None:
+                total -= size
+                path = self._blob_path(digest)
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.warning("Failed to remove cached image %s: %s", path, e)
+        self._conn.commit()
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'revalidated': self._revalidated,
+                'bytes': self._total_bytes() if self.enabled else 0,
+                'max_bytes': self.max_bytes,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache():
+    """Return the process-wide image cache."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ImageCache()
+    return _cache
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import logging
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import requests
+
+from src.utils import http_client, metrics
+from src.utils.image_cache import get_image_cache
+
+logger = logging.getLogger(__name__)
+
+# 同時に取得する画像の最大数（全体 / ホストごと）
+IMAGE_FETCH_WORKERS = int(os.environ.get('QIITA_IMAGE_WORKERS', '8'))
+IMAGE_FETCH_PER_HOST = int(os.environ.get('QIITA_IMAGE_PER_HOST', '4'))
+
+
+class _HostLimiter:
+    """Per-host semaphores limiting concurrent requests to the same server."""
+
+    def __init__(self, limit):
+        self.limit = max(1, limit)
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    def get(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.limit)
+                self._semaphores[host] = semaphore
+            return semaphore
+
+
+# 複数の記事を並列処理する場合もホストごとの上限を共有する
+_default_limiter = _HostLimiter(IMAGE_FETCH_PER_HOST)
+
+
+def _read_cached(entry):
+    # 他のスレッド・プロセスが検索の後に追い出したブロブは、キャッシュにないものとして扱う
+    try:
+        return entry.read()
+    except OSError as e:
+        logger.debug("Cached image %s is gone: %s", entry.url, e)
+        return None
+
+
+@metrics.timed('image_fetch')
+def fetch_image(url):
+    """Fetch a single image and return (content, content_type).
+
+    The shared image cache is consulted first; stale entries are revalidated
+    with a conditional GET. Cache errors never fail the fetch: a blob that
+    cannot be read is fetched again, and one that cannot be stored is only
+    logged.
+    """
+    cache = get_image_cache()
+    cached = cache.lookup(url)
+    if cached is not None and cached.is_fresh:
+        content = _read_cached(cached)
+        if content is not None:
+            return content, cached.content_type
+        cached = None
+
+    headers = cached.validators() if cached is not None else {}
+    response = http_client.get(url, stream=True, headers=headers)
+    if cached is not None and response.status_code == 304:
+        response.close()
+        content = _read_cached(cached)
+        if content is not None:
+            cache.refresh(cached, response.headers)
+            return content, cached.content_type
+        response = http_client.get(url, stream=True)
+
+    response.raise_for_status()
+    content = http_client.read_limited(response, http_client.MAX_IMAGE_BYTES)
+    metrics.BYTES_FETCHED.inc(len(content), kind='image')
+    try:
+        cache.store(url, content, response.headers)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning("Failed to cache image %s: %s", url, e)
+    return content, response.headers.get('Content-Type')
+
+
+def iter_images(urls, max_workers=None, per_host=None, checkpoint=None, errors=None):
+    """Fetch images concurrently, yielding results in the order of ``urls``.
+
+    Each result is ``(content, content_type)`` or ``None`` when that image
+    failed. Duplicate URLs are fetched only once. Exceeding the byte budget
+    of the request or job raises ``ByteBudgetExceeded``. With ``checkpoint``
+    (a ``JobCheckpoint``) images stored by an earlier attempt are reused and
+    new ones are stored as soon as they arrive. ``errors`` (a dict) receives
+    the exception of each URL that failed.
+    """
+    if not urls:
+        return
+
+    max_workers = max(1, max_workers or IMAGE_FETCH_WORKERS)
+    limiter = _HostLimiter(per_host) if per_host else _default_limiter
+
+    def fetch(url):
+        if checkpoint is not None:
+            stored = checkpoint.load_image(url)
+            if stored is not None:
+                return stored
+        with limiter.get(url):
+            try:
+                result = fetch_image(url)
+            except http_client.ByteBudgetExceeded:
+                # 画像1枚の失敗と違い、リクエスト・ジョブ全体を中止する
+                raise
+            except requests.exceptions.RequestException as e:
+                metrics.UPSTREAM_ERRORS.inc(kind='image')
+                logger.warning("Failed to download %s: %s", url, e)
+                if errors is not None:
+                    errors[url] = e
+                return None
+        if checkpoint is not None:
+            checkpoint.save_image(url, *result)
+        return result
+
+    unique_urls = list(dict.fromkeys(urls))
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique_urls))) as executor:
+        # リクエストIDなどのコンテキストをワーカースレッドに引き継ぐ
+        futures = {url: executor.submit(contextvars.copy_context().run, fetch, url) for url in unique_urls}
+        for url in urls:
+            yield futures[url].result()
+
+
+def fetch_images(urls, max_workers=None, per_host=None):
+    """Fetch images concurrently and return a list aligned with ``urls``."""
+    return list(iter_images(urls, max_workers, per_host))
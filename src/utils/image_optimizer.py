@@ -0,0 +1,192 @@
+import io
+import os
+import logging
+import threading
+import importlib.util
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# 画像最適化の設定（既定では無効。リクエストの "optimize_images" でも指定可能）
+IMAGE_OPTIMIZE = os.environ.get('QIITA_IMAGE_OPTIMIZE', '0') == '1'
+IMAGE_MAX_DIMENSION = int(os.environ.get('QIITA_IMAGE_MAX_DIMENSION', '0'))
+IMAGE_OUTPUT_FORMAT = os.environ.get('QIITA_IMAGE_FORMAT', '').lower()
+IMAGE_QUALITY = int(os.environ.get('QIITA_IMAGE_QUALITY', '85'))
+IMAGE_PROCESSES = int(os.environ.get('QIITA_IMAGE_PROCESSES', '0')) or os.cpu_count() or 1
+
+OUTPUT_FORMATS = ('webp', 'avif')
+
+# Pillowの保存形式（PNG以外の可逆形式はPNGに変換する）
+_SAVE_FORMATS = {'JPEG': 'jpeg', 'PNG': 'png', 'WEBP': 'webp', 'BMP': 'png', 'TIFF': 'png'}
+
+
+class ImageOptions:
+    """Settings for the optional image optimisation stage."""
+
+    def __init__(self, max_dimension=IMAGE_MAX_DIMENSION, output_format=IMAGE_OUTPUT_FORMAT,
+                 quality=IMAGE_QUALITY):
+        self.max_dimension = max_dimension
+        self.output_format = output_format if output_format in OUTPUT_FORMATS else ''
+        self.quality = quality
+
+    @property
+    def variant(self):
+        """Short identifier used to keep cached artifacts of different settings apart."""
+        return f"opt-{self.max_dimension}-{self.output_format or 'keep'}-{self.quality}"
+
+
+def options_from_request(value):
+    """Build ImageOptions from a request's ``optimize_images`` field.
+
+    Accepts ``true``/``false`` or an object with ``max_dimension``, ``format``
+    and ``quality``; ``None`` falls back to the QIITA_IMAGE_OPTIMIZE default.
+    Raises ValueError for malformed values.
+    """
+    if value is None:
+        value = IMAGE_OPTIMIZE
+    if value is False:
+        return None
+    if value is True:
+        return ImageOptions()
+    if not isinstance(value, dict):
+        raise ValueError('optimize_images は true/false またはオブジェクトで指定してください')
+
+    output_format = str(value.get('format', IMAGE_OUTPUT_FORMAT)).lower()
+    if output_format and output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"format は {', '.join(OUTPUT_FORMATS)} のいずれかを指定してください")
+    try:
+        max_dimension = int(value.get('max_dimension', IMAGE_MAX_DIMENSION))
+        quality = int(value.get('quality', IMAGE_QUALITY))
+    except (TypeError, ValueError):
+        raise ValueError('max_dimension と quality は整数で指定してください')
+    return ImageOptions(max_dimension, output_format, max(1, min(quality, 100)))
+
+
+def optimize_image(content, options):
+    """Resize, re-encode and strip metadata from one image.
+
+    Returns ``(content, output_format)``; ``output_format`` is None when the
+    original bytes are kept. Runs in a worker process.
+    """
+    from PIL import Image, features
+
+    with Image.open(io.BytesIO(content)) as image:
+        source_format = image.format
+        if source_format not in _SAVE_FORMATS or getattr(image, 'is_animated', False):
+            return content, None
+        image.load()
+
+        resized = False
+        if options.max_dimension and max(image.size) > options.max_dimension:
+            image.thumbnail((options.max_dimension, options.max_dimension), Image.LANCZOS)
+            resized = True
+
+        output_format = options.output_format
+        if output_format == 'avif' and not features.check('avif'):
+            output_format = ''
+        output_format = output_format or _SAVE_FORMATS[source_format]
+
+        if output_format == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        elif image.mode == 'CMYK':
+            image = image.convert('RGB')
+
+        # info/exif を渡さずに保存することでメタデータを除去する
+        buffer = io.BytesIO()
+        if output_format == 'png':
+            image.save(buffer, 'PNG', optimize=True)
+        elif output_format == 'jpeg':
+            image.save(buffer, 'JPEG', quality=options.quality, optimize=True, progressive=True)
+        else:
+            image.save(buffer, output_format.upper(), quality=options.quality)
+
+    optimized = buffer.getvalue()
+    # 縮小していない画像は、小さくならなければ元のまま使う
+    if not resized and len(optimized) >= len(content):
+        return content, None
+    return optimized, output_format
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the process pool, started with spawn so worker threads are not forked."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=IMAGE_PROCESSES, mp_context=multiprocessing.get_context('spawn')
+                )
+    return _executor
+
+
+def _reset_executor(executor):
+    """Drop ``executor`` after one of its processes died, so the next call starts a new pool."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+            logger.warning("Image optimisation pool broke; starting a new one")
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(content, options):
+    """Return ``(executor, future)``; the future is None if the pool is broken."""
+    executor = _get_executor()
+    try:
+        return executor, executor.submit(optimize_image, content, options)
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        return executor, None
+
+
+def optimize_images(results, options, stats=None):
+    """Optimize fetched images in the process pool, preserving their order.
+
+    ``results`` yields ``(content, content_type)`` or None; this yields
+    ``(content, content_type, output_format)`` or None. Byte counts before and
+    after are accumulated in ``stats`` (``original_bytes``/``output_bytes``).
+    """
+    # Pillow はオプション（読み込むのは画像を処理するワーカープロセスだけ）
+    if importlib.util.find_spec('PIL') is None:
+        logger.warning("Pillow is not installed; skipping image optimisation")
+        for result in results:
+            yield None if result is None else (result[0], result[1], None)
+        return
+
+    window = IMAGE_PROCESSES * 2
+    pending = deque()
+
+    def finish():
+        result, executor, future = pending.popleft()
+        if result is None:
+            return None
+        content, content_type = result
+        optimized, output_format = content, None
+        if future is not None:
+            try:
+                optimized, output_format = future.result()
+            except BrokenProcessPool as e:
+                # ワーカープロセスが落ちた（OOM など）。プールを作り直し、この画像は元のまま使う
+                logger.warning("Image optimisation failed, keeping original: %s", e)
+                _reset_executor(executor)
+            except Exception as e:
+                logger.warning("Image optimisation failed, keeping original: %s", e)
+        if stats is not None:
+            stats['original_bytes'] = stats.get('original_bytes', 0) + len(content)
+            stats['output_bytes'] = stats.get('output_bytes', 0) + len(optimized)
+        return optimized, content_type, output_format
+
+    for result in results:
+        executor, future = (None, None) if result is None else _submit(result[0], options)
+        pending.append((result, executor, future))
+        while len(pending) > window or (pending and (pending[0][2] is None or pending[0][2].done())):
+            yield finish()
+    while pending:
+        yield finish()
@@ -0,0 +1,133 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# 再開時に記事ページと一緒に復元するヘッダー
+_PAGE_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+def _write_atomic(path, data):
+    partial_path = f"{path}.part"
+    with open(partial_path, 'wb') as f:
+        f.write(data)
+    os.replace(partial_path, path)
+
+
+class JobCheckpoint:
+    """On-disk progress of one job, so a retry resumes instead of starting over.
+
+    The directory holds the job's request options, the article page once it
+    has been parsed successfully, and every image as soon as it is fetched.
+    Files are written atomically; the image index is an append-only log, so
+    a crash loses at most the image being written.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._images = None
+
+    def _path(self, *names):
+        return os.path.join(self.directory, *names)
+
+    def exists(self):
+        return os.path.isdir(self.directory)
+
+    def remove(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def save_options(self, url, options):
+        """Store what is needed to run the job again (``options`` must be JSON serialisable)."""
+        os.makedirs(self.directory, exist_ok=True)
+        _write_atomic(self._path('job.json'), json.dumps({'url': url, 'options': options}).encode('utf-8'))
+
+    def load_options(self):
+        """Return the stored ``options``, or None without a checkpoint."""
+        try:
+            with open(self._path('job.json'), encoding='utf-8') as f:
+                return json.load(f)['options']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save_page(self, response):
+        """Store a fetched article page (HTML or API JSON) and its validators."""
+        os.makedirs(self.directory, exist_ok=True)
+        headers = {name: response.headers[name] for name in _PAGE_HEADERS if name in response.headers}
+        _write_atomic(self._path('page.body'), response.content)
+        _write_atomic(self._path('page.json'), json.dumps({'url': response.url, 'headers': headers}).encode('utf-8'))
+
+    def load_page(self):
+        """Return the stored page as a ``requests.Response``, or None."""
+        try:
+            with open(self._path('page.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(self._path('page.body'), 'rb') as f:
+                content = f.read()
+        except (OSError, ValueError):
+            return None
+        response = requests.Response()
+        response.status_code = 200
+        response.url = meta.get('url')
+        response.headers = CaseInsensitiveDict(meta.get('headers') or {})
+        response._content = content
+        return response
+
+    def _load_index(self):
+        images = {}
+        try:
+            with open(self._path('images.jsonl'), encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # 書き込み途中で中断された最後の行
+                        continue
+                    images[entry['url']] = (entry['file'], entry.get('content_type'))
+        except OSError:
+            pass
+        return images
+
+    @property
+    def image_count(self):
+        with self._lock:
+            if self._images is None:
+                self._images = self._load_index()
+            return len(self._images)
+
+    def load_image(self, url):
+        """Return ``(content, content_type)`` of an image fetched earlier, or None."""
+        with self._lock:
+            if self._images is None:
+                self._images = self._load_index()
+            entry = self._images.get(url)
+        if entry is None:
+            return None
+        try:
+            with open(self._path('images', entry[0]), 'rb') as f:
+                return f.read(), entry[1]
+        except OSError:
+            return None
+
+    def save_image(self, url, content, content_type):
+        """Persist a fetched image; called from the image fetch threads."""
+        name = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        try:
+            os.makedirs(self._path('images'), exist_ok=True)
+            _write_atomic(self._path('images', name), content)
+            with self._lock:
+                if self._images is None:
+                    self._images = self._load_index()
+                with open(self._path('images.jsonl'), 'a', encoding='utf-8') as f:
+                    f.write(json.dumps({'url': url, 'file': name, 'content_type': content_type}) + '\n')
+                self._images[url] = (name, content_type)
+        except OSError as e:
+            # チェックポイントに書けなくてもジョブは続ける（再開時に取得し直す）
+            logger.warning("Failed to checkpoint image %s: %s", url, e)
@@ -0,0 +1,287 @@
+import os
+import uuid
+import socket
+import logging
+import tempfile
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from src.models.user import db
+from src.models.job import DownloadJob
+from src.utils.http_client import ResponseTooLarge, byte_budget
+from src.utils.job_checkpoint import JobCheckpoint
+from src.utils.rate_limiter import flow
+
+logger = logging.getLogger(__name__)
+
+# バックグラウンドジョブの設定
+JOB_WORKERS = int(os.environ.get('QIITA_JOB_WORKERS', '2'))
+JOB_MAX_PENDING = int(os.environ.get('QIITA_JOB_MAX_PENDING', '100'))
+JOB_ARTIFACT_TTL = int(os.environ.get('QIITA_JOB_ARTIFACT_TTL', '3600'))
+JOB_ARTIFACT_DIR = os.environ.get(
+    'QIITA_JOB_ARTIFACT_DIR',
+    os.path.join(tempfile.gettempdir(), 'qiita_web_downloader', 'jobs'),
+)
+JOB_CLEANUP_INTERVAL = 60
+# 失敗したジョブを自動で再試行する回数と、1回目の再試行までの秒数（回数に比例して延ばす）
+JOB_RETRIES = int(os.environ.get('QIITA_JOB_RETRIES', '2'))
+JOB_RETRY_DELAY = float(os.environ.get('QIITA_JOB_RETRY_DELAY', '2'))
+
+_INTERRUPTED_ERROR = 'サーバーの再起動により中断されました（再実行すると取得済みの画像から再開します）'
+
+# 実行中の試行が最後かどうか（最後の試行では取得できなかった画像を諦めて完了させる）
+_final_attempt = ContextVar('job_final_attempt', default=True)
+
+
+def _worker_id():
+    # インポート時ではなく呼び出し時に求める（gunicorn の preload_app ではフォーク前にインポートされる）
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid):
+    if pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class QueueFullError(Exception):
+    """Raised when too many jobs are already queued or running."""
+
+
+class IncompleteJobError(Exception):
+    """Raised by a task whose result is usable but incomplete, to have it retried."""
+
+
+def final_attempt():
+    """True unless the running job will be retried if it fails."""
+    return _final_attempt.get()
+
+
+class JobQueue:
+    """Bounded worker pool running download jobs whose state lives in the database."""
+
+    def __init__(self, app, max_workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING,
+                 artifact_dir=JOB_ARTIFACT_DIR, ttl=JOB_ARTIFACT_TTL, retries=JOB_RETRIES,
+                 retry_delay=JOB_RETRY_DELAY):
+        self.app = app
+        self.max_pending = max_pending
+        self.artifact_dir = artifact_dir
+        self.ttl = ttl
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='download-job')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._queued = {}
+        self._stop = threading.Event()
+        os.makedirs(artifact_dir, exist_ok=True)
+
+        with app.app_context():
+            self._fail_interrupted_jobs()
+        threading.Thread(target=self._cleanup_loop, name='download-job-cleanup', daemon=True).start()
+
+    def _fail_interrupted_jobs(self):
+        """Fail active jobs whose worker process on this host no longer exists."""
+        active = DownloadJob.query.filter(DownloadJob.status.in_(('queued', 'running')))
+        for job in active:
+            host, _, pid = (job.worker or '').rpartition(':')
+            if host != socket.gethostname() or _pid_alive(int(pid or 0)):
+                continue
+            job.status = 'failed'
+            job.error = _INTERRUPTED_ERROR
+            job.expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        db.session.commit()
+
+    def artifact_path(self, job_id):
+        return os.path.join(self.artifact_dir, f"{job_id}.zip")
+
+    def checkpoint(self, job_id):
+        return JobCheckpoint(os.path.join(self.artifact_dir, f"{job_id}.checkpoint"))
+
+    def _reserve(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFullError('ジョブが混み合っています。しばらくしてから再度お試しください')
+            self._pending += 1
+
+    def submit(self, url, task, options=None):
+        """Create a job for ``url`` and run ``task(job_id, url)`` in the pool.
+
+        ``options`` (JSON serialisable) is kept in the job's checkpoint so the
+        job can be run again with ``resubmit``.
+        """
+        self._reserve()
+        job = DownloadJob(id=uuid.uuid4().hex, url=url, worker=_worker_id())
+        try:
+            if options is not None:
+                self.checkpoint(job.id).save_options(url, options)
+            db.session.add(job)
+            db.session.commit()
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+        self._enqueue(job.id, url, task)
+        return job
+
+    def resubmit(self, job, task):
+        """Queue a failed job again; it resumes from its checkpoint.
+
+        Returns False if the job is no longer failed (e.g. another request
+        already resubmitted it).
+        """
+        self._reserve()
+        claimed = DownloadJob.query.filter_by(id=job.id, status='failed').update({
+            'status': 'queued', 'stage': 'queued', 'error': None, 'expires_at': None, 'worker': _worker_id(),
+        })
+        db.session.commit()
+        if not claimed:
+            with self._lock:
+                self._pending -= 1
+            return False
+        db.session.refresh(job)
+        self._enqueue(job.id, job.url, task)
+        return True
+
+    def _enqueue(self, job_id, url, task):
+        with self._lock:
+            self._queued[job_id] = self._executor.submit(self._run, job_id, url, task)
+
+    def _fail_job(self, job_id, error):
+        update_job(job_id, status='failed', error=error, expires_at=datetime.utcnow() + timedelta(seconds=self.ttl))
+
+    def _run(self, job_id, url, task):
+        try:
+            with self._lock:
+                self._queued.pop(job_id, None)
+            if self._stop.is_set():
+                with self.app.app_context():
+                    self._fail_job(job_id, _INTERRUPTED_ERROR)
+                    db.session.remove()
+                return
+            with self.app.app_context(), flow(f"job-{job_id}"), byte_budget():
+                update_job(job_id, status='running')
+                try:
+                    self._run_with_retries(job_id, url, task)
+                    update_job(
+                        job_id, status='succeeded', stage='done', error=None,
+                        expires_at=datetime.utcnow() + timedelta(seconds=self.ttl)
+                    )
+                except Exception as e:
+                    logger.error("Job %s failed: %s", job_id, e)
+                    db.session.rollback()
+                    self._fail_job(job_id, str(e))
+                finally:
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _run_with_retries(self, job_id, url, task):
+        attempt = 0
+        while True:
+            token = _final_attempt.set(attempt >= self.retries)
+            try:
+                return task(job_id, url)
+            except ResponseTooLarge:
+                # サイズの上限は再試行しても変わらない
+                raise
+            except Exception as e:
+                if attempt >= self.retries or self._stop.is_set():
+                    raise
+                attempt += 1
+                logger.warning("Job %s failed, retrying (%d/%d): %s", job_id, attempt, self.retries, e)
+                db.session.rollback()
+                update_job(job_id, stage='retrying', error=str(e))
+                # 停止時は待たずに失敗させる（チェックポイントは残るので後から再実行できる）
+                if self._stop.wait(self.retry_delay * attempt):
+                    raise
+            finally:
+                _final_attempt.reset(token)
+
+    def cleanup_expired(self):
+        """Delete finished jobs and their artifacts once their TTL has passed."""
+        expired = DownloadJob.query.filter(DownloadJob.expires_at < datetime.utcnow()).all()
+        for job in expired:
+            if job.artifact_path:
+                try:
+                    os.remove(job.artifact_path)
+                except OSError:
+                    pass
+            self.checkpoint(job.id).remove()
+            db.session.delete(job)
+        db.session.commit()
+        return len(expired)
+
+    def _cleanup_loop(self):
+        while not self._stop.wait(JOB_CLEANUP_INTERVAL):
+            try:
+                with self.app.app_context():
+                    # 他のワーカープロセスが異常終了した場合に備えて定期的にも確認する
+                    self._fail_interrupted_jobs()
+                    removed = self.cleanup_expired()
+                    if removed:
+                        logger.info("Removed %s expired jobs", removed)
+            except Exception as e:
+                logger.warning("Job cleanup failed: %s", e)
+
+    def shutdown(self, wait=True):
+        """Stop taking jobs; queued jobs are failed so they can be resumed with a retry.
+
+        With ``wait`` the jobs already running are finished first.
+        """
+        self._stop.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        with self._lock:
+            cancelled = [job_id for job_id, future in self._queued.items() if future.cancelled()]
+            for job_id in cancelled:
+                del self._queued[job_id]
+                self._pending -= 1
+        if cancelled:
+            with self.app.app_context():
+                for job_id in cancelled:
+                    self._fail_job(job_id, _INTERRUPTED_ERROR)
+                db.session.remove()
+            logger.info("Cancelled %d queued jobs", len(cancelled))
+
+
+def update_job(job_id, **fields):
+    """Update and commit fields of a job row."""
+    job = db.session.get(DownloadJob, job_id)
+    if job is None:
+        return None
+    for name, value in fields.items():
+        setattr(job, name, value)
+    db.session.commit()
+    return job
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue(app):
+    """Return the process-wide job queue bound to ``app``."""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(app)
+    return _queue
+
+
+def shutdown_job_queue(wait=True):
+    """Stop the job queue if one was started, finishing running jobs when ``wait``.
+
+    Jobs that have not started yet are failed and can be resumed later.
+    """
+    if _queue is not None:
+        _queue.shutdown(wait=wait)
@@ -0,0 +1,105 @@
+import os
+import json
+import uuid
+import logging
+import itertools
+import threading
+from contextvars import ContextVar
+
+# ログの設定（アプリ起動時に一度だけ適用する）
+LOG_LEVEL = os.environ.get('QIITA_LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('QIITA_LOG_FORMAT', 'text')
+# DEBUGログは N 件に1件だけ出力する（1 で全件）
+LOG_DEBUG_SAMPLE = max(1, int(os.environ.get('QIITA_LOG_DEBUG_SAMPLE', '1')))
+
+TEXT_FORMAT = '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'
+
+_request_id = ContextVar('request_id', default='-')
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def get_request_id():
+    """Request id of the current request, or ``-`` outside a request."""
+    return _request_id.get()
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request id to every record."""
+
+    def filter(self, record):
+        record.request_id = _request_id.get()
+        return True
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Pass only every ``rate``-th DEBUG record; other levels always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno != logging.DEBUG or self.rate <= 1:
+            return True
+        return next(self._counter) % self.rate == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log collectors."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def configure_logging(level=None, fmt=None, debug_sample=None, stream=None):
+    """Install the root handler once; later calls are no-ops."""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(stream)
+        handler.addFilter(RequestIdFilter())
+        handler.addFilter(DebugSamplingFilter(debug_sample or LOG_DEBUG_SAMPLE))
+        if (fmt or LOG_FORMAT) == 'json':
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+        root = logging.getLogger()
+        root.addHandler(handler)
+        root.setLevel(level or LOG_LEVEL)
+        # 接続プールの詳細はDEBUG時も抑える
+        logging.getLogger('urllib3').setLevel(logging.WARNING)
+        _configured = True
+
+
+def init_app(app):
+    """Assign each request an id (from ``X-Request-ID`` if sent) and echo it back."""
+    from flask import g, request
+
+    @app.before_request
+    def _assign_request_id():
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:16]
+        g.request_id_token = _request_id.set(request_id[:64])
+
+    @app.after_request
+    def _send_request_id(response):
+        response.headers['X-Request-ID'] = _request_id.get()
+        return response
+
+    @app.teardown_request
+    def _clear_request_id(exc):
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            _request_id.reset(token)
@@ -0,0 +1,99 @@
+import re
+import unicodedata
+
+_FENCE_LINE = re.compile(r'^ {0,3}(`{3,}|~{3,})(.*)$', re.MULTILINE)
+_HEADING = re.compile(r'^(#{1,6})[ \t]*(?=[^\s#])', re.MULTILINE)
+# インラインコードは改行をまたげる（空行はまたがない）
+_INLINE_CODE = re.compile(r'(`+)(?!`)(?:[^\n]|\n(?![ \t]*\n))*?(?<!`)\1(?!`)')
+_EMPHASIS = re.compile(r'(?<!\*)(\*\*|\*)(?![\s*])(.+?)(?<![\s*])\1(?!\*)')
+
+# インラインコードを一時的に置き換える文字（句読点として扱う）
+_PLACEHOLDER = '\x00'
+
+
+def _is_punctuation(char):
+    return char == _PLACEHOLDER or unicodedata.category(char)[0] in ('P', 'S')
+
+
+def _space_emphasis(match):
+    """Add spaces so that CommonMark treats the delimiters as emphasis.
+
+    A closing ``**`` preceded by punctuation and followed by a letter (e.g.
+    ``**text(内容)**text``) is not right-flanking, so a space is inserted after
+    it; the opening delimiter is handled symmetrically.
+    """
+    delimiter, inner = match.group(1), match.group(2)
+    starts_with_punctuation = _is_punctuation(inner[0])
+    ends_with_punctuation = _is_punctuation(inner[-1])
+    if not starts_with_punctuation and not ends_with_punctuation:
+        return match.group(0)
+
+    line = match.string
+    before = line[match.start() - 1] if match.start() > 0 else ' '
+    after = line[match.end()] if match.end() < len(line) else ' '
+
+    prefix = ''
+    if starts_with_punctuation and not before.isspace() and not _is_punctuation(before):
+        prefix = ' '
+    suffix = ''
+    if ends_with_punctuation and not after.isspace() and not _is_punctuation(after):
+        suffix = ' '
+    return f"{prefix}{delimiter}{inner}{delimiter}{suffix}"
+
+
+def _normalize_text(text):
+    """Normalize a stretch of Markdown that contains no fenced code."""
+    code_spans = []
+
+    def mask(match):
+        code_spans.append(match.group(0))
+        return _PLACEHOLDER
+
+    masked = _INLINE_CODE.sub(mask, text) if '`' in text else text
+    masked = _HEADING.sub(r'\1 ', masked)
+    if '*' in masked:
+        masked = _EMPHASIS.sub(_space_emphasis, masked)
+    if not code_spans:
+        return masked
+    spans = iter(code_spans)
+    return re.sub(_PLACEHOLDER, lambda _: next(spans), masked)
+
+
+def fenced_code_spans(text):
+    """Yield (start, end) offsets of fenced code blocks, fences included.
+
+    Follows CommonMark: a fence is three or more backticks or tildes indented
+    by at most three spaces (a backtick fence's info string may not contain
+    a backtick), closed by a fence of the same character at least as long
+    with nothing but whitespace after it. An unclosed block runs to the end
+    of ``text``.
+    """
+    fence = None
+    start = 0
+    for match in _FENCE_LINE.finditer(text):
+        marker, rest = match.group(1), match.group(2)
+        if fence is None:
+            if marker[0] == '`' and '`' in rest:
+                continue
+            fence, start = marker, match.start()
+        elif marker[0] == fence[0] and len(marker) >= len(fence) and not rest.strip():
+            yield start, match.end()
+            fence = None
+    if fence is not None:
+        yield start, len(text)
+
+
+def normalize_markdown(text):
+    """Normalize markdownify output in a single pass over the document.
+
+    Fixes ATX heading spacing and emphasis spacing while leaving fenced code
+    blocks and inline code untouched.
+    """
+    parts = []
+    position = 0
+    for start, end in fenced_code_spans(text):
+        parts.append(_normalize_text(text[position:start]))
+        parts.append(text[start:end])
+        position = end
+    parts.append(_normalize_text(text[position:]))
+    return ''.join(parts)
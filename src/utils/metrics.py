@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# レイテンシのヒストグラムの区切り（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 複数のワーカープロセスのメトリクスを集計するディレクトリ（gunicorn.conf.py が設定する。空なら集計しない）
+METRICS_DIR = os.environ.get('QIITA_METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = 1.0
+
+_registry = []
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+# 現在のリクエストのスレッドIDと、そこで計測した (stage, 秒) の一覧。リクエスト外では None
+_request_spans = ContextVar('request_spans', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """A labelled metric rendered in the Prometheus text exposition format."""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labelnames)
+
+    def collect(self):
+        """Return ``{label values: value}`` of this process."""
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, total, values):
+        """Add ``values`` collected in another process into ``total``."""
+        for key, value in values.items():
+            total[key] = total.get(key, 0) + value
+
+    def render(self, values=None, labelnames=None):
+        """Render ``values`` (by default this process's) with ``labelnames`` (by default the metric's)."""
+        if values is None:
+            values = self.collect()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self._render_samples(sorted(values.items()), labelnames or self.labelnames))
+        return lines
+
+    def _render_samples(self, items, labelnames):
+        return [
+            f"{self.name}{_format_labels(labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        """Return ``{label values: count}``."""
+        return self.collect()
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def snapshot(self):
+        """Return ``{label values: (count, sum)}``."""
+        with self._lock:
+            return {key: (sum(counts), total) for key, (counts, total) in self._values.items()}
+
+    def collect(self):
+        with self._lock:
+            return {key: [list(counts), total] for key, (counts, total) in self._values.items()}
+
+    def merge(self, total, values):
+        for key, (counts, value_sum) in values.items():
+            state = total.setdefault(key, [[0] * len(counts), 0.0])
+            state[0] = [a + b for a, b in zip(state[0], counts)]
+            state[1] += value_sum
+
+    def _render_samples(self, items, labelnames):
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(labelnames, key, [('le', _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Collected(_Metric):
+    """A counter or gauge whose values are read from elsewhere (e.g. a cache) when collected.
+
+    ``collect`` returns ``(label values, value)`` pairs.
+    """
+
+    def __init__(self, name, documentation, type, labelnames, collect):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self._collector = collect
+
+    def collect(self):
+        return {tuple(key): value for key, value in self._collector()}
+
+
+STAGE_SECONDS = Histogram(
+    'qiita_stage_duration_seconds', 'Time spent in each processing stage.', ['stage']
+)
+REQUEST_SECONDS = Histogram(
+    'qiita_request_duration_seconds', 'Time until response headers are sent, per endpoint.',
+    ['endpoint', 'status']
+)
+BYTES_FETCHED = Counter(
+    'qiita_upstream_bytes_total', 'Bytes downloaded from upstream servers.', ['kind']
+)
+UPSTREAM_ERRORS = Counter(
+    'qiita_upstream_errors_total', 'Failed upstream requests.', ['kind']
+)
+IMAGES_PER_ARTICLE = Histogram(
+    'qiita_article_images', 'Images downloaded per article.',
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200)
+)
+RATE_LIMIT_WAIT = Histogram(
+    'qiita_rate_limit_wait_seconds', 'Time outbound requests waited in the rate limit queue, per host.', ['host']
+)
+RATE_LIMIT_THROTTLED = Counter(
+    'qiita_rate_limit_throttled_total', '429 responses received from upstream, per host.', ['host']
+)
+RATE_LIMIT_REJECTED = Counter(
+    'qiita_rate_limit_rejected_total', 'Requests failed because the rate limit wait was too long.', ['host']
+)
+
+
+def observe_stage(stage, seconds):
+    """Record a stage duration in the histogram and the current request's spans."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    current = _request_spans.get()
+    # 並列に動くワーカースレッドの時間は合計すると実時間を超えるため含めない
+    if current is not None and current[0] == threading.get_ident():
+        current[1].append((stage, seconds))
+
+
+@contextmanager
+def timed(stage):
+    """Time the enclosed block as ``stage``; also usable as a function decorator."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def start_request_spans():
+    """Start collecting spans for the current request; returns a token for ``end_request_spans``."""
+    return _request_spans.set((threading.get_ident(), []))
+
+
+def end_request_spans(token):
+    _request_spans.reset(token)
+
+
+def request_spans():
+    """Spans recorded so far in the current request, or an empty list."""
+    current = _request_spans.get()
+    return current[1] if current is not None else []
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot():
+    """Write this process's metrics to ``METRICS_DIR/<pid>.json`` for the other processes to read."""
+    snapshot = {
+        metric.name: [[list(key), value] for key, value in metric.collect().items()] for metric in _registry
+    }
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    with open(f"{path}.part", 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+    os.replace(f"{path}.part", path)
+
+
+def _flush_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            write_snapshot()
+        except OSError as e:
+            logger.warning("Failed to write metrics: %s", e)
+
+
+def start_flusher():
+    """Keep this process's snapshot in ``METRICS_DIR`` current; a no-op without it.
+
+    Called on every request; starts one thread per process (also after a fork).
+    """
+    global _flusher_pid
+    if not METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True).start()
+
+
+def _read_snapshots():
+    """Return ``{pid: snapshot}`` of the other processes in ``METRICS_DIR``."""
+    snapshots = {}
+    for name in os.listdir(METRICS_DIR):
+        pid, ext = os.path.splitext(name)
+        if ext != '.json' or not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name), encoding='utf-8') as f:
+                snapshots[int(pid)] = json.load(f)
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def _render_merged():
+    """Sum counters and histograms over all processes, including ones that have exited.
+
+    Gauges are only meaningful per process: those of live processes are
+    rendered with a ``pid`` label.
+    """
+    snapshots = _read_snapshots()
+    live = {pid for pid in snapshots if _pid_alive(pid)}
+    lines = []
+    for metric in _registry:
+        own = metric.collect()
+        others = {
+            pid: {tuple(key): value for key, value in snapshot.get(metric.name, [])}
+            for pid, snapshot in snapshots.items()
+        }
+        if metric.type == 'gauge':
+            values = {key + (os.getpid(),): value for key, value in own.items()}
+            for pid in live:
+                values.update({key + (pid,): value for key, value in others[pid].items()})
+            lines.extend(metric.render(values, metric.labelnames + ('pid',)))
+            continue
+        values = {}
+        metric.merge(values, own)
+        for other in others.values():
+            metric.merge(values, other)
+        lines.extend(metric.render(values))
+    return lines
+
+
+def render():
+    """Render all registered metrics in the Prometheus text format.
+
+    With ``METRICS_DIR`` the metrics of every worker process are combined.
+    """
+    if METRICS_DIR:
+        lines = _render_merged()
+    else:
+        lines = [line for metric in _registry for line in metric.render()]
+    return '\n'.join(lines) + '\n'
+
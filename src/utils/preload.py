@@ -0,0 +1,58 @@
+import os
+import time
+import logging
+import importlib
+import importlib.util
+from importlib import metadata
+
+logger = logging.getLogger(__name__)
+
+# 起動時に重い依存モジュールを読み込んでおく（0 で各ワーカーが最初に使うときまで遅らせる）
+PRELOAD = os.environ.get('QIITA_PRELOAD', '1') == '1'
+
+# 記事の解析・変換でだけ使う重いモジュール（各モジュールは使う関数の中で import する）
+HEAVY_MODULES = ('bs4', 'markdownify', 'lxml.etree', 'PIL.Image')
+# ヘルスチェックで確認する必須の依存モジュールと、そのパッケージ名
+REQUIRED_MODULES = {'requests': 'requests', 'bs4': 'beautifulsoup4', 'markdownify': 'markdownify'}
+
+_dependency_status = None
+
+
+def preload(modules=HEAVY_MODULES):
+    """Import ``modules`` now; returns ``{name: seconds}``.
+
+    Called once where startup cost is acceptable (the gunicorn master before
+    forking), so workers share the loaded modules instead of each paying for
+    them on its first request. Optional modules that are not installed are
+    skipped.
+    """
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            continue
+        timings[name] = time.perf_counter() - start
+    logger.info("Preloaded %s in %.3fs", ', '.join(timings), sum(timings.values()))
+    return timings
+
+
+def dependency_status():
+    """``{module: version}`` of the required dependencies, without importing them.
+
+    Raises ImportError for a missing module. The result is computed once per
+    process.
+    """
+    global _dependency_status
+    if _dependency_status is None:
+        status = {}
+        for name, package in REQUIRED_MODULES.items():
+            if importlib.util.find_spec(name) is None:
+                raise ImportError(f"No module named '{name}'")
+            try:
+                status[name] = metadata.version(package)
+            except metadata.PackageNotFoundError:
+                status[name] = 'ok'
+        _dependency_status = status
+    return _dependency_status
@@ -0,0 +1,175 @@
+import os
+import re
+from urllib.parse import urljoin, urlparse
+
+from src.utils import http_client
+from src.utils.markdown_normalizer import fenced_code_spans
+
+QIITA_API_BASE = os.environ.get('QIITA_API_BASE', 'https://qiita.com/api/v2')
+QIITA_ACCESS_TOKEN = os.environ.get('QIITA_ACCESS_TOKEN')
+QIITA_API_PER_PAGE = 100
+
+_ITEM_PATH = re.compile(r'^/[^/]+/items/[0-9a-f]+$')
+_ITEM_ID = re.compile(r'/items/([0-9a-f]+)/?$')
+
+# Markdown中の画像参照（![alt](url "title") と <img src="url">）
+_MARKDOWN_IMAGE = re.compile(r'(!\[[^\]]*\]\(\s*<?)([^)\s>]+)')
+_HTML_IMAGE = re.compile(r'(<img\b[^>]*?\bsrc\s*=\s*["\'])([^"\']+)', re.IGNORECASE)
+
+
+def api_headers(headers=None):
+    """Request headers for the Qiita API, including the access token if configured."""
+    merged = {'Accept': 'application/json'}
+    if QIITA_ACCESS_TOKEN:
+        merged['Authorization'] = f"Bearer {QIITA_ACCESS_TOKEN}"
+    if headers:
+        merged.update(headers)
+    return merged
+
+
+def extract_item_id(url):
+    """Return the item id of an article URL, or None if it is not an article."""
+    match = _ITEM_ID.search(urlparse(url).path)
+    return match.group(1) if match else None
+
+
+def fetch_item(item_id, headers=None):
+    """GET /items/:id. The raw response is returned so callers can inspect its status."""
+    return http_client.get(
+        f"{QIITA_API_BASE}/items/{item_id}", headers=api_headers(headers), max_bytes=http_client.MAX_PAGE_BYTES
+    )
+
+
+class MarkdownBody:
+    """Raw Markdown of an article fetched from the Qiita API.
+
+    Image references outside fenced code blocks can be rewritten in place,
+    mirroring how ``<img>`` tags are rewritten when scraping HTML. ``html``
+    is the API's ``rendered_body``, used by the HTML-based exporters.
+    """
+
+    def __init__(self, text, html=None):
+        self.text = text
+        self.html = html
+        code_spans = list(fenced_code_spans(text))
+
+        def in_code(position):
+            return any(start <= position < end for start, end in code_spans)
+
+        refs = []
+        for pattern in (_MARKDOWN_IMAGE, _HTML_IMAGE):
+            for match in pattern.finditer(text):
+                if not in_code(match.start()):
+                    refs.append((match.start(2), match.end(2)))
+        self._refs = sorted(refs)
+        self._sources = {}
+
+    def image_refs(self):
+        """Return ``(src, set_src)`` pairs for each image in document order."""
+        def setter(index):
+            def set_src(src):
+                self._sources[index] = src
+            return set_src
+
+        return [(self.text[start:end], setter(index)) for index, (start, end) in enumerate(self._refs)]
+
+    def render(self):
+        """Return the Markdown with rewritten image sources applied."""
+        parts = []
+        position = 0
+        for index, (start, end) in enumerate(self._refs):
+            if index in self._sources:
+                parts.append(self.text[position:start])
+                parts.append(self._sources[index])
+                position = end
+        parts.append(self.text[position:])
+        return ''.join(parts)
+
+    def render_html(self):
+        """Return ``html`` with the same image sources rewritten, or None without it."""
+        from bs4 import BeautifulSoup
+
+        if self.html is None:
+            return None
+        rewritten = {
+            self.text[start:end]: self._sources[index]
+            for index, (start, end) in enumerate(self._refs) if index in self._sources
+        }
+        soup = BeautifulSoup(self.html, 'html.parser')
+        for img_tag in soup.find_all('img'):
+            src = rewritten.get(img_tag.get('src'))
+            if src is not None:
+                img_tag['src'] = src
+                if img_tag.parent.name == 'a':
+                    img_tag.parent.unwrap()
+        return str(soup)
+
+
+def _list_api_items(path, limit):
+    """Collect items from a paginated Qiita API v2 list endpoint."""
+    items = []
+    page = 1
+    while len(items) < limit:
+        per_page = min(QIITA_API_PER_PAGE, limit - len(items))
+        response = http_client.get(
+            f"{QIITA_API_BASE}{path}", params={'page': page, 'per_page': per_page},
+            headers=api_headers(), max_bytes=http_client.MAX_PAGE_BYTES
+        )
+        response.raise_for_status()
+        page_items = response.json()
+        items.extend(
+            {'id': item['id'], 'url': item['url'], 'updated_at': item.get('updated_at')}
+            for item in page_items
+        )
+        if len(page_items) < per_page:
+            break
+        page += 1
+    return items[:limit]
+
+
+def _scrape_items(page_url, limit):
+    """Collect article links from an HTML listing page (e.g. an organization).
+
+    Listing pages carry no update times, so ``updated_at`` is None.
+    """
+    from bs4 import BeautifulSoup
+
+    response = http_client.get(page_url, max_bytes=http_client.MAX_PAGE_BYTES)
+    response.raise_for_status()
+    soup = BeautifulSoup(response.content, 'html.parser')
+    items = []
+    seen = set()
+    for link in soup.find_all('a', href=True):
+        url = urljoin(page_url, link['href']).split('#')[0].split('?')[0]
+        if _ITEM_PATH.match(urlparse(url).path) and url not in seen:
+            seen.add(url)
+            items.append({'id': extract_item_id(url), 'url': url, 'updated_at': None})
+            if len(items) >= limit:
+                break
+    return items
+
+
+def resolve_source(source_url):
+    """Return ``(kind, name)`` of a user, tag or organization page.
+
+    ``kind`` is ``users``, ``tags`` or ``organizations``.
+    """
+    parts = [part for part in urlparse(source_url).path.split('/') if part]
+    if len(parts) >= 2 and parts[0] in ('tags', 'organizations'):
+        return parts[0], parts[1]
+    if len(parts) == 1 or (len(parts) == 2 and parts[1] == 'items'):
+        return 'users', parts[0]
+    raise ValueError('ユーザー・タグ・Organizationのページを指定してください')
+
+
+def list_items(source_url, limit):
+    """Resolve a Qiita user, tag or organization page to ``{id, url, updated_at}`` items."""
+    kind, name = resolve_source(source_url)
+    if kind == 'organizations':
+        return _scrape_items(f"https://qiita.com/organizations/{name}/items", limit)
+    return _list_api_items(f"/{kind}/{name}/items", limit)
+
+
+def list_item_urls(source_url, limit):
+    """Resolve a Qiita user, tag or organization page to article URLs."""
+    return [item['url'] for item in list_items(source_url, limit)]
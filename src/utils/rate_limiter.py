@@ -0,0 +1,278 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+from src.utils import metrics
+from src.utils.log_config import get_request_id
+
+logger = logging.getLogger(__name__)
+
+# 送信先ホストごとのレート制限（毎秒のリクエスト数、0 で無効）と連続して送れる数
+RATE_LIMIT = float(os.environ.get('QIITA_RATE_LIMIT', '20'))
+RATE_LIMIT_BURST = int(os.environ.get('QIITA_RATE_LIMIT_BURST', '50'))
+# ホストごとの上書き（例: "qiita.com=5:10,qiita.com/api=1:5"）
+RATE_LIMIT_HOSTS = os.environ.get('QIITA_RATE_LIMIT_HOSTS', '')
+# これより長く待つ必要がある場合は待たずにエラーにする（秒）
+RATE_LIMIT_MAX_WAIT = float(os.environ.get('QIITA_RATE_LIMIT_MAX_WAIT', '30'))
+# Retry-After のない 429 / 503 を受けたときに送信を止める秒数
+RATE_LIMIT_PAUSE = 1.0
+
+# 公平に順番を回す単位（ジョブID、なければリクエストID）
+_flow = ContextVar('rate_limit_flow', default=None)
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """Raised when a request would have to wait longer than the allowed maximum."""
+
+
+def limit_key(url):
+    """Bucket key for ``url``: the host, with the Qiita API counted separately."""
+    parsed = urlparse(url)
+    # APIの残り回数（Rate-Remaining）はAPIにだけ適用されるため、同じホストのページとは分ける
+    if parsed.path.startswith('/api/'):
+        return f"{parsed.netloc}/api"
+    return parsed.netloc
+
+
+@contextmanager
+def flow(key):
+    """Schedule requests made in the block, and in threads copying its context, as one flow."""
+    token = _flow.set(key)
+    try:
+        yield
+    finally:
+        _flow.reset(token)
+
+
+def run_in_flow(key, fn, *args, **kwargs):
+    """Call ``fn`` as part of flow ``key``; for work submitted to thread pools."""
+    with flow(key):
+        return fn(*args, **kwargs)
+
+
+def current_flow():
+    return _flow.get() or get_request_id()
+
+
+def _parse_hosts(value):
+    """Parse ``host=rate[:burst],...`` into ``{host: (rate, burst)}``."""
+    hosts = {}
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        host, _, limit = entry.partition('=')
+        rate, _, burst = limit.partition(':')
+        try:
+            hosts[host.strip()] = (float(rate), int(burst) if burst else None)
+        except ValueError:
+            logger.warning("Ignoring invalid QIITA_RATE_LIMIT_HOSTS entry: %s", entry)
+    return hosts
+
+
+def _retry_after(value):
+    """Seconds from a Retry-After header (delta seconds or an HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value, cast):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _Bucket:
+    """Token bucket for one host, granting tokens to flows in round-robin order.
+
+    Each flow (a job or request) queues its requests FIFO; when a token is
+    free the head of the first flow is served and that flow moves to the back,
+    so one large batch cannot starve a single download.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        # Rate-Remaining / Rate-Reset から求めたリセットまでのレート
+        self.budget_rate = None
+        self.budget_until = 0.0
+        self.flows = OrderedDict()
+        self.queued = 0
+        self.condition = threading.Condition()
+
+    def _effective_rate(self, now):
+        if self.budget_rate is not None and now < self.budget_until:
+            return min(self.rate, self.budget_rate)
+        return self.rate
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self._effective_rate(now))
+        self.updated = now
+
+    def _delay(self, now):
+        """Seconds until a token is available."""
+        self._refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self._effective_rate(now)
+
+    def _dequeue(self, flow, ticket, served):
+        queue = self.flows[flow]
+        queue.remove(ticket)
+        self.queued -= 1
+        if not queue:
+            del self.flows[flow]
+        elif served:
+            self.flows.move_to_end(flow)
+
+    def acquire(self, flow, max_wait):
+        """Wait for a token; returns the seconds waited."""
+        ticket = object()
+        start = time.monotonic()
+        deadline = start + max_wait
+        with self.condition:
+            self.flows.setdefault(flow, deque()).append(ticket)
+            self.queued += 1
+            served = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    if next(iter(self.flows.values()))[0] is ticket:
+                        delay = self._delay(now)
+                        if delay <= 0:
+                            self.tokens -= 1
+                            served = True
+                            return now - start
+                        if now + delay > deadline:
+                            raise RateLimitExceeded(f"rate limited for another {delay:.1f}s")
+                        self.condition.wait(delay)
+                    elif now >= deadline:
+                        raise RateLimitExceeded(f"waited {now - start:.1f}s in the rate limit queue")
+                    else:
+                        self.condition.wait(deadline - now)
+            finally:
+                self._dequeue(flow, ticket, served)
+                self.condition.notify_all()
+
+    def observe(self, status, headers):
+        """Adapt to rate-limit headers and throttling responses."""
+        now = time.monotonic()
+        with self.condition:
+            self._refill(now)
+            remaining = _number(headers.get('Rate-Remaining'), int)
+            reset = _number(headers.get('Rate-Reset'), float)
+            if remaining is not None and reset is not None:
+                until = now + max(0.0, reset - time.time())
+                if remaining <= 0:
+                    self.paused_until = max(self.paused_until, until)
+                elif until > now:
+                    # 残り回数をリセットまでの時間で均等に使う
+                    self.budget_rate = remaining / (until - now)
+                    self.budget_until = until
+                    self.tokens = min(self.tokens, float(remaining))
+            if status in (429, 503):
+                retry_after = _retry_after(headers.get('Retry-After'))
+                pause = RATE_LIMIT_PAUSE if retry_after is None else retry_after
+                self.paused_until = max(self.paused_until, now + pause)
+            self.condition.notify_all()
+
+    def stats(self):
+        now = time.monotonic()
+        with self.condition:
+            self._refill(now)
+            return {
+                'queued': self.queued,
+                'tokens': round(self.tokens, 2),
+                'rate': self._effective_rate(now),
+                'paused_seconds': round(max(0.0, self.paused_until - now), 2),
+            }
+
+
+class RateLimiter:
+    """Per-host token buckets shared by every thread of the process."""
+
+    def __init__(self, rate=RATE_LIMIT, burst=RATE_LIMIT_BURST, hosts=None, max_wait=RATE_LIMIT_MAX_WAIT):
+        self.rate = rate
+        self.burst = burst
+        self.hosts = _parse_hosts(RATE_LIMIT_HOSTS) if hosts is None else hosts
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def _bucket(self, key):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    rate, burst = self.hosts.get(key) or self.hosts.get(key.split('/')[0]) or (self.rate, None)
+                    bucket = _Bucket(rate, burst or self.burst) if rate > 0 else None
+                    self._buckets[key] = bucket
+        return bucket
+
+    def is_limited(self, url):
+        """True if requests to ``url`` go through a bucket (its rate is not 0)."""
+        return self._bucket(limit_key(url)) is not None
+
+    def acquire(self, url):
+        """Block until a request to ``url`` may be sent; returns the seconds waited."""
+        key = limit_key(url)
+        bucket = self._bucket(key)
+        if bucket is None:
+            return 0.0
+        try:
+            waited = bucket.acquire(current_flow(), self.max_wait)
+        except RateLimitExceeded as e:
+            metrics.RATE_LIMIT_REJECTED.inc(host=key)
+            logger.warning("Rate limit for %s: %s", key, e)
+            raise
+        metrics.RATE_LIMIT_WAIT.observe(waited, host=key)
+        return waited
+
+    def observe(self, url, response):
+        """Feed a response's status and rate-limit headers back into its bucket."""
+        key = limit_key(url)
+        bucket = self._bucket(key)
+        if bucket is None:
+            return
+        if response.status_code == 429:
+            metrics.RATE_LIMIT_THROTTLED.inc(host=key)
+        bucket.observe(response.status_code, response.headers)
+
+    def get_stats(self):
+        with self._lock:
+            buckets = [(key, bucket) for key, bucket in self._buckets.items() if bucket is not None]
+        return {key: bucket.stats() for key, bucket in buckets}
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return the process-wide rate limiter."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = RateLimiter()
+    return _limiter
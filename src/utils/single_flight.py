@@ -0,0 +1,90 @@
+import shutil
+import threading
+
+
+class Flight:
+    """One in-progress build that any number of requests can wait on."""
+
+    def __init__(self):
+        self._done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the build finishes; return its result or raise its error."""
+        if not self._done.wait(timeout):
+            raise TimeoutError('timed out waiting for an in-progress download')
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight:
+    """Deduplicate concurrent work by key.
+
+    The first caller of ``begin`` for a key becomes the leader and must call
+    ``finish``; callers arriving before that wait on the same ``Flight``.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def begin(self, key):
+        """Return ``(flight, is_leader)``."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                return flight, False
+            flight = self._flights[key] = Flight()
+            return flight, True
+
+    def finish(self, key, flight, result=None, error=None, publish=None):
+        """Complete ``flight``; only the first call has an effect.
+
+        ``publish(waiters)``, if given, is called under the lock with the final
+        number of waiters and its return value becomes the result.
+        """
+        with self._lock:
+            if flight.done:
+                return
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            if error is None and publish is not None:
+                result = publish(flight.waiters)
+            flight.result, flight.error = result, error
+            flight._done.set()
+
+
+class SharedFile:
+    """A file handed to several requests, removed when the last one has opened it.
+
+    Each holder calls ``open()`` once; the directory is deleted after the final
+    open, which is safe on POSIX because open handles keep the data readable.
+    """
+
+    def __init__(self, path, cleanup_dir, holders, **info):
+        self.path = path
+        self.info = info
+        self._cleanup_dir = cleanup_dir
+        self._holders = holders
+        self._lock = threading.Lock()
+
+    def open(self):
+        try:
+            return open(self.path, 'rb')
+        finally:
+            self.release()
+
+    def release(self):
+        with self._lock:
+            self._holders -= 1
+            remove = self._holders <= 0
+        if remove:
+            shutil.rmtree(self._cleanup_dir, ignore_errors=True)
@@ -0,0 +1,188 @@
+import os
+import re
+import gzip
+import hashlib
+import logging
+import mimetypes
+
+from flask import Response
+from werkzeug.wsgi import wrap_file
+
+try:
+    import brotli
+except ImportError:  # brotli はオプション（なければgzipのみ）
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 起動時に圧縮できるファイルのgzip / brotli版をメモリ上に用意する（0 で無効）
+STATIC_PRECOMPRESS = os.environ.get('QIITA_STATIC_PRECOMPRESS', '1') == '1'
+# ファイル名に内容のハッシュを含む（内容が変わると名前も変わる）ファイルの判定
+STATIC_IMMUTABLE_PATTERN = os.environ.get('QIITA_STATIC_IMMUTABLE_PATTERN', r'[.-][0-9a-f]{8,}\.\w+$')
+# これより大きいファイルはメモリに載せず、送信のたびにディスクから読む
+STATIC_MEMORY_MAX_BYTES = 1024 * 1024
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# ハッシュのないファイルは毎回 ETag で更新を確認させる
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# 圧縮版を選ぶ優先順（Accept-Encoding の q 値が同じ場合）
+ENCODINGS = ('br', 'gzip')
+_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+_ENCODED_TYPES = {'br': 'application/x-brotli', 'gzip': 'application/gzip'}
+_COMPRESSIBLE_TYPES = (
+    'application/javascript', 'application/json', 'application/xml', 'application/wasm',
+    'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon',
+)
+# 小さいファイルは圧縮してもヘッダー分しか減らない
+_COMPRESS_MIN_BYTES = 1024
+
+
+def _compressible(media_type):
+    return media_type.startswith('text/') or media_type in _COMPRESSIBLE_TYPES
+
+
+class _Body:
+    """One representation of a static file, held in memory or read from disk when sent."""
+
+    def __init__(self, path, size, etag, data=None):
+        self.path = path
+        self.size = size
+        self.etag = etag
+        self.data = data
+
+
+class StaticFile:
+    """A file of the static folder with its caching metadata and encoded variants."""
+
+    def __init__(self, name, media_type, immutable, identity):
+        self.name = name
+        self.media_type = media_type
+        self.immutable = immutable
+        self.variants = {None: identity}
+
+    def negotiate(self, accept_encodings):
+        """Return ``(encoding, body)`` for a request's ``Accept-Encoding``; encoding None is identity."""
+        best, best_quality = None, 0
+        for encoding in ENCODINGS:
+            quality = accept_encodings[encoding] if encoding in self.variants else 0
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best, self.variants[best]
+
+
+def _read(path, size):
+    if size > STATIC_MEMORY_MAX_BYTES:
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _load(root, name, precompress):
+    path = os.path.join(root, name)
+    size = os.path.getsize(path)
+    media_type, file_encoding = mimetypes.guess_type(name)
+    if file_encoding is not None:
+        # app.js.gz 自体を直接要求された場合は圧縮ファイルとして返す
+        media_type = _ENCODED_TYPES.get(file_encoding)
+    media_type = media_type or 'application/octet-stream'
+    data = _read(path, size)
+    digest = hashlib.sha256()
+    if data is not None:
+        digest.update(data)
+    else:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+
+    immutable = re.search(STATIC_IMMUTABLE_PATTERN, os.path.basename(name)) is not None
+    static_file = StaticFile(name, media_type, immutable, _Body(path, size, etag, data))
+    if not _compressible(media_type):
+        return static_file
+
+    source = data
+    for encoding in ENCODINGS:
+        # ビルド時に作られた app.js.gz / app.js.br があればそれを使う
+        encoded_path = path + _SUFFIXES[encoding]
+        if os.path.isfile(encoded_path):
+            encoded_size = os.path.getsize(encoded_path)
+            static_file.variants[encoding] = _Body(
+                encoded_path, encoded_size, f"{etag}-{encoding}", _read(encoded_path, encoded_size)
+            )
+            continue
+        if not precompress or size < _COMPRESS_MIN_BYTES or (encoding == 'br' and brotli is None):
+            continue
+        if source is None:
+            # メモリに載せない大きなファイルも、圧縮版が上限に収まれば保持する
+            with open(path, 'rb') as f:
+                source = f.read()
+        if encoding == 'gzip':
+            encoded = gzip.compress(source, compresslevel=9, mtime=0)
+        else:
+            encoded = brotli.compress(source, quality=11)
+        if len(encoded) < size and len(encoded) <= STATIC_MEMORY_MAX_BYTES:
+            static_file.variants[encoding] = _Body(None, len(encoded), f"{etag}-{encoding}", encoded)
+    return static_file
+
+
+class StaticManifest:
+    """In-memory index of the static folder, built once so requests never touch the filesystem.
+
+    Every file gets a strong ETag from its content; compressible files also
+    get gzip (and, with the ``brotli`` package, br) variants, either from
+    precompressed ``.gz`` / ``.br`` files next to them or compressed here.
+    """
+
+    def __init__(self, root, precompress=STATIC_PRECOMPRESS):
+        self.root = root
+        self.precompress = precompress
+        self._files = {}
+        self.build()
+
+    def build(self):
+        """(Re)scan the static folder."""
+        files = {}
+        if self.root and os.path.isdir(self.root):
+            for directory, dirnames, filenames in os.walk(self.root):
+                dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+                for filename in sorted(filenames):
+                    if filename.startswith('.'):
+                        continue
+                    name = os.path.relpath(os.path.join(directory, filename), self.root).replace(os.sep, '/')
+                    try:
+                        files[name] = _load(self.root, name, self.precompress)
+                    except OSError as e:
+                        logger.warning("Skipping static file %s: %s", name, e)
+        self._files = files
+        logger.debug(
+            "Indexed %d static files (%d compressed variants)",
+            len(files), sum(len(static_file.variants) - 1 for static_file in files.values()),
+        )
+
+    def get(self, name):
+        return self._files.get(name)
+
+
+def send_static_file(request, static_file):
+    """Build the response for ``static_file``, honouring Accept-Encoding and If-None-Match."""
+    encoding, body = static_file.negotiate(request.accept_encodings)
+    if request.if_none_match.contains_weak(body.etag):
+        response = Response(status=304)
+    elif body.data is not None:
+        response = Response(body.data, mimetype=static_file.media_type)
+    else:
+        response = Response(
+            wrap_file(request.environ, open(body.path, 'rb')),
+            mimetype=static_file.media_type, direct_passthrough=True,
+        )
+        response.content_length = body.size
+    if encoding is not None and response.status_code == 200:
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(body.etag)
+    if len(static_file.variants) > 1:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = (
+        IMMUTABLE_CACHE_CONTROL if static_file.immutable else REVALIDATE_CACHE_CONTROL
+    )
+    return response
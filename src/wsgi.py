@@ -0,0 +1,17 @@
+"""WSGI entry point for production servers.
+
+    gunicorn src.wsgi:app          # settings are read from gunicorn.conf.py
+
+With ``preload_app`` the master imports this module once before forking:
+the database schema is created here, and Flask, BeautifulSoup (and lxml),
+markdownify, requests and Pillow are loaded a single time and shared
+copy-on-write by all workers. With ``QIITA_PRELOAD=0`` the article parsing
+modules are instead loaded by each worker on first use, which makes the
+server start accepting connections sooner.
+"""
+from src.main import app, init_database  # noqa: F401
+from src.utils import preload
+
+init_database()
+if preload.PRELOAD:
+    preload.preload()
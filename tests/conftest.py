@@ -0,0 +1,11 @@
+"""Settings shared by every test module.
+
+The environment is read into module constants on import, so it is set here,
+before any test module imports ``src``.
+"""
+import os
+
+os.environ.update(
+    QIITA_INGEST_MODE='api', QIITA_IMAGE_CACHE_MAX_BYTES='0', QIITA_ARTICLE_CACHE_MAX_BYTES='0',
+    QIITA_RATE_LIMIT='0', QIITA_ARCHIVE='0', NO_PROXY='127.0.0.1',
+)
@@ -0,0 +1,25 @@
+"""Request validation of the batch download endpoint.
+
+    python -m pytest tests
+"""
+import pytest
+from flask import Flask
+
+from src.routes.batch import batch_bp
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    app.register_blueprint(batch_bp, url_prefix='/api')
+    return app.test_client()
+
+
+@pytest.mark.parametrize('limit', [0, -1, '-3', 'ten', None, [1]])
+def test_invalid_limit_is_rejected(client, limit):
+    response = client.post('/api/batch-download', json={
+        'urls': ['https://qiita.com/a/items/1', 'https://qiita.com/b/items/2'],
+        'limit': limit,
+    })
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'limitは1以上の整数で指定してください'}
@@ -0,0 +1,72 @@
+"""Golden-output tests for ``normalize_markdown``.
+
+    python -m pytest tests
+"""
+import pytest
+
+from src.utils.markdown_normalizer import normalize_markdown
+from src.utils.qiita_api import MarkdownBody
+
+CASES = {
+    # コードブロック・インラインコードの中は変更しない
+    'fenced code': (
+        "```python\n# comment\n#not heading\nx = a*b*c\n**bold(x)**y\n```\n#Title\n",
+        "```python\n# comment\n#not heading\nx = a*b*c\n**bold(x)**y\n```\n# Title\n",
+    ),
+    'tilde fence': ("~~~\n#x\n~~~\n#Title\n", "~~~\n#x\n~~~\n# Title\n"),
+    'longer fence': ("````\n```\n#x\n```\n````\n#y\n", "````\n```\n#x\n```\n````\n# y\n"),
+    'unclosed fence': ("```\n# open\n**(x)**y\n", "```\n# open\n**(x)**y\n"),
+    'inline code': ("Use `a*b*c` and `**(x)**y` here.\n", "Use `a*b*c` and `**(x)**y` here.\n"),
+    'inline code around emphasis': ("`code` **(x)**y `more`\n", "`code` **(x)** y `more`\n"),
+    'inline code across lines': ("Use `**(x)**y\nand #z` here\n", "Use `**(x)**y\nand #z` here\n"),
+    'inline code wrapping a hash': ("a `foo\n#bar` b\n", "a `foo\n#bar` b\n"),
+    'backticks across a blank line': ("a `x\n\n#y` **(z)**w\n", "a `x\n\n# y` **(z)** w\n"),
+    'backtick in info string': ("```a`b\n#x\n", "```a`b\n# x\n"),
+    'backtick in tilde info string': ("~~~ `x`\n#x\n~~~\n#y\n", "~~~ `x`\n#x\n~~~\n# y\n"),
+
+    # 見出しの # の後の空白
+    'heading without space': ("#Title\n", "# Title\n"),
+    'heading with tab': ("##\tTitle\n", "## Title\n"),
+    'heading starting with code': ("#`code`\n", "# `code`\n"),
+    'bare heading': ("##\nTitle\n", "##\nTitle\n"),
+    'headings between code': ("#Title\n```\n#x\n```\n##Next\n", "# Title\n```\n#x\n```\n## Next\n"),
+    'seven hashes': ("#######Seven\n", "#######Seven\n"),
+    'hash inside text': ("Text #notheading\n", "Text #notheading\n"),
+    'indented hash': ("    #indented\n", "    #indented\n"),
+
+    # 強調の前後の空白
+    'emphasis ending in punctuation': ("**text(内容)**text\n", "**text(内容)** text\n"),
+    'emphasis wrapped in punctuation': ("これは**「強調」**です\n", "これは **「強調」** です\n"),
+    'plain emphasis': ("**plain**text\n", "**plain**text\n"),
+    'spaced asterisks': ("x ** y ** z\n", "x ** y ** z\n"),
+
+    # リストの * と強調
+    'list bullets': (
+        "* item\n* **太字(注)**です\n* *a*\n",
+        "* item\n* **太字(注)** です\n* *a*\n",
+    ),
+    'list bullet before emphasis': ("* *(x)*y\n", "* *(x)* y\n"),
+    'list bullet before strong': ("* **(x)**\n", "* **(x)**\n"),
+    'list emphasis inside text': ("* list with *emph(x)*y\n", "* list with *emph(x)* y\n"),
+    'ordered list': ("1. **注意(重要)**を読む\n", "1. **注意(重要)** を読む\n"),
+    'dash list': ("- **A**: b\n", "- **A**: b\n"),
+}
+
+
+@pytest.mark.parametrize('source, expected', CASES.values(), ids=CASES.keys())
+def test_normalize_markdown(source, expected):
+    assert normalize_markdown(source) == expected
+
+
+@pytest.mark.parametrize('source, expected', CASES.values(), ids=CASES.keys())
+def test_normalize_markdown_is_idempotent(source, expected):
+    assert normalize_markdown(expected) == expected
+
+
+def test_api_images_skip_the_same_code_blocks():
+    # Qiita API の Markdown でも、正規化と同じ範囲をコードとして扱う
+    text = (
+        "![a](a.png)\n```\n![b](b.png)\n````\n![c](c.png)\n"
+        "```x`y\n![d](d.png)\n~~~\n![e](e.png)\n"
+    )
+    assert [src for src, _ in MarkdownBody(text).image_refs()] == ['a.png', 'c.png', 'd.png']
@@ -0,0 +1,58 @@
+"""Combining the metrics of several worker processes.
+
+    python -m pytest tests
+"""
+import os
+import json
+import subprocess
+import sys
+
+from src.utils import metrics
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def _write(directory, pid, snapshot):
+    with open(os.path.join(directory, f"{pid}.json"), 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f)
+
+
+def test_render_sums_counters_and_labels_gauges_by_pid(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, '_registry', [metrics.BYTES_FETCHED, metrics.IMAGES_PER_ARTICLE])
+    metrics.Collected('test_queued', 'Queued.', 'gauge', ('host',), lambda: [(('a',), 1)])
+    own = metrics.BYTES_FETCHED.snapshot().get(('image',), 0)
+
+    buckets = len(metrics.IMAGES_PER_ARTICLE.buckets) + 1
+    live, dead = os.getppid(), _dead_pid()
+    _write(tmp_path, live, {
+        'qiita_upstream_bytes_total': [[['image'], 100]],
+        'qiita_article_images': [[[], [[1] + [0] * (buckets - 1), 0.0]]],
+        'test_queued': [[['a'], 2]],
+    })
+    # 終了したワーカーのカウンターは残し、ゲージは含めない
+    _write(tmp_path, dead, {
+        'qiita_upstream_bytes_total': [[['image'], 20]],
+        'test_queued': [[['a'], 5]],
+    })
+    (tmp_path / 'broken.json').write_text('{')
+
+    lines = metrics.render().splitlines()
+    assert f'qiita_upstream_bytes_total{{kind="image"}} {own + 120}' in lines
+    assert 'qiita_article_images_bucket{le="0.0"} 1' in lines
+    assert f'test_queued{{host="a",pid="{os.getpid()}"}} 1' in lines
+    assert f'test_queued{{host="a",pid="{live}"}} 2' in lines
+    assert not any(f'pid="{dead}"' in line for line in lines)
+
+
+def test_write_snapshot_round_trips(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    metrics.BYTES_FETCHED.inc(7, kind='page')
+    metrics.write_snapshot()
+    with open(tmp_path / f"{os.getpid()}.json", encoding='utf-8') as f:
+        snapshot = json.load(f)
+    assert ['page'] in [key for key, _ in snapshot['qiita_upstream_bytes_total']]
@@ -0,0 +1,92 @@
+"""Differential sync against a local stub of the Qiita API.
+
+    python -m pytest tests
+"""
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+from flask import Flask
+
+from src.models.user import db
+from src.routes import sync
+from src.utils import qiita_api
+
+
+class _QiitaStub(BaseHTTPRequestHandler):
+    items = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', f'"{hash(body)}"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        path = self.path.split('?')[0]
+        if path == '/api/v2/users/u/items':
+            return self._send([
+                {'id': item_id, 'url': f"{base}/u/items/{item_id}", 'updated_at': updated_at}
+                for item_id, (_, updated_at, _) in self.items.items()
+            ])
+        if path.startswith('/api/v2/items/'):
+            title, updated_at, body = self.items[path.rsplit('/', 1)[1]]
+            return self._send({'title': title, 'updated_at': updated_at, 'body': body})
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+@pytest.fixture
+def qiita(monkeypatch):
+    _QiitaStub.items = {
+        f"{n:020x}": (f"Article {n}", '2024-01-01T00:00:00+09:00', f"# Article {n}\n\nbody")
+        for n in range(10)
+    }
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _QiitaStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(qiita_api, 'QIITA_API_BASE', f"http://127.0.0.1:{server.server_address[1]}/api/v2")
+    yield _QiitaStub.items
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'app.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+
+def test_resync_of_changed_articles(app, qiita, tmp_path, monkeypatch):
+    monkeypatch.setattr(sync, 'SYNC_WORKERS', 2)
+    root = str(tmp_path / 'mirror')
+
+    first = sync.sync_source('https://qiita.com/u', root=root)
+    assert (first['added'], first['failed']) == (10, 0)
+
+    # 一覧の updated_at が変わった記事は条件付きで取得し直す
+    for item_id, (title, _, body) in list(qiita.items()):
+        qiita[item_id] = (title, '2024-02-01T00:00:00+09:00', body)
+    second = sync.sync_source('https://qiita.com/u', root=root)
+    assert second['errors'] == []
+    assert second['failed'] == 0
+    assert second['unchanged'] == 10
+
+    for item_id in list(qiita)[:4]:
+        title, updated_at, body = qiita[item_id]
+        qiita[item_id] = (title, '2024-03-01T00:00:00+09:00', body + ' changed')
+    third = sync.sync_source('https://qiita.com/u', root=root)
+    assert (third['updated'], third['unchanged'], third['failed']) == (4, 6, 0)